@@ -0,0 +1,193 @@
+# Copyright (c) 2026, Frappe Technologies Pvt Ltd and contributors
+# For license information, please see license.txt
+
+"""Warm the render caches of published Builder Pages.
+
+After a migrate or a publish every cache is cold, and the first visitor of each
+page pays for compiling it. `warm_render_cache` compiles published pages ahead
+of them, the most visited first (by the page views in DuckDB), and renders
+their routes once as a guest so the page output caches are filled too. Dynamic
+routes are rendered for their most visited paths.
+
+The pages are split over a few background jobs, see `CACHE_WARMING_JOBS`
+(`builder_cache_warming_jobs` in the site config), and the progress of each
+warming is tracked in Redis under its own run id (`get_cache_warming_progress`).
+"""
+
+import frappe
+from frappe.utils import cint, set_request
+from frappe.website.serve import get_response
+from werkzeug.exceptions import NotFound
+
+from builder.builder.render_cache import get_compiled_page
+
+CACHE_WARMING_JOBS = 2
+CACHE_WARMING_PENDING_KEY = "builder_cache_warming_pending"
+CACHE_WARMING_PROGRESS_KEY = "builder_cache_warming_progress"
+CACHE_WARMING_LAST_RUN_KEY = "builder_cache_warming_last_run"
+CACHE_WARMING_PROGRESS_TTL = 24 * 60 * 60
+# traffic considered when ordering pages
+CACHE_WARMING_TRAFFIC_DAYS = 30
+PATHS_PER_DYNAMIC_PAGE = 5
+
+
+def enqueue_cache_warming(pages: list[str] | None = None):
+	"""Warm the given pages, or every published page, in the background."""
+	if frappe.flags.in_migrate:
+		# jobs run inline during a migrate, leave it to the scheduler
+		frappe.cache.set_value(CACHE_WARMING_PENDING_KEY, 1)
+		return
+	frappe.enqueue(
+		"builder.builder.cache_warming.warm_render_cache",
+		queue="long",
+		pages=pages,
+		enqueue_after_commit=True,
+	)
+
+
+def enqueue_pending_cache_warming():
+	"""Scheduler event: warm every published page if a migrate asked for it."""
+	if frappe.cache.get_value(CACHE_WARMING_PENDING_KEY):
+		frappe.cache.delete_value(CACHE_WARMING_PENDING_KEY)
+		enqueue_cache_warming()
+
+
+def warm_render_cache(pages: list[str] | None = None):
+	"""Background job: split the pages to warm, busiest first, over `CACHE_WARMING_JOBS` jobs."""
+	targets = get_warming_targets(pages)
+	if not targets:
+		return
+
+	jobs = max(cint(frappe.conf.get("builder_cache_warming_jobs")) or CACHE_WARMING_JOBS, 1)
+	# a page publish must not hide the progress of a full warming still running
+	run_id = start_progress(len(targets), full=not pages)
+	for index in range(min(jobs, len(targets))):
+		# every job gets a share of the busiest pages
+		frappe.enqueue(
+			"builder.builder.cache_warming.warm_pages",
+			queue="long",
+			targets=targets[index::jobs],
+			run_id=run_id,
+		)
+
+
+def get_warming_targets(pages: list[str] | None = None) -> list[dict]:
+	"""Published pages to warm, most visited first, with the paths to render for each."""
+	from builder.builder_analytics import get_recent_views_by_path
+
+	filters = {"published": 1}
+	if pages:
+		filters["name"] = ("in", pages)
+	published = {
+		page.name: page
+		for page in frappe.get_all(
+			"Builder Page",
+			filters=filters,
+			fields=["name", "route", "dynamic_route", "authenticated_access"],
+		)
+	}
+	if not published:
+		return []
+
+	views, visited_paths = {}, {}
+	for path, count in get_recent_views_by_path(days=CACHE_WARMING_TRAFFIC_DAYS).items():
+		page_name = get_page_for_path(path)
+		if page_name in published:
+			views[page_name] = views.get(page_name, 0) + count
+			visited_paths.setdefault(page_name, []).append(path)
+
+	targets = []
+	for page in sorted(published.values(), key=lambda page: views.get(page.name, 0), reverse=True):
+		paths = []
+		# only what guests see can be rendered ahead of them
+		if not page.authenticated_access:
+			if page.dynamic_route:
+				paths = visited_paths.get(page.name, [])[:PATHS_PER_DYNAMIC_PAGE]
+			else:
+				paths = [page.route]
+		targets.append({"page": page.name, "paths": paths})
+	return targets
+
+
+def get_page_for_path(path: str) -> str | None:
+	from builder.builder.doctype.builder_page.builder_page import find_page_with_path, get_dynamic_route_map
+
+	path = path.strip("/")
+	if page_name := find_page_with_path(path):
+		return page_name
+	try:
+		page_name, _ = get_dynamic_route_map().bind("").match(f"/{path}")
+	except NotFound:
+		return None
+	return page_name
+
+
+def warm_pages(targets: list[dict], run_id: str, on_progress=None):
+	"""Compile each page and render its paths, reporting the run's progress after each page."""
+	for target in targets:
+		try:
+			warm_page(target["page"], target["paths"])
+			update_progress(run_id, "done")
+		except Exception:
+			frappe.log_error(title=f"Failed to warm the render cache of Builder Page {target['page']}")
+			update_progress(run_id, "failed")
+		if on_progress:
+			on_progress(get_cache_warming_progress(run_id))
+
+
+def warm_page(page_name: str, paths: list[str]):
+	page = frappe.get_cached_doc("Builder Page", page_name)
+	get_compiled_page(page.name, page.blocks)
+	for path in paths:
+		render_as_guest(path)
+
+
+def render_as_guest(path: str):
+	previous_user = frappe.session.user
+	previous_request = getattr(frappe.local, "request", None)
+	previous_form_dict = getattr(frappe.local, "form_dict", frappe._dict())
+	previous_no_cache = getattr(frappe.local, "no_cache", 0)
+	try:
+		frappe.set_user("Guest")
+		# every path is rendered as a fresh request: route variables and no_cache set
+		# by the previous path must not leak into its data scripts and caches
+		frappe.local.form_dict = frappe._dict()
+		frappe.local.no_cache = 0
+		set_request(method="GET", path=f"/{path.strip('/')}")
+		response = get_response(f"/{path.strip('/')}")
+		# render errors are turned into an error page
+		if response.status_code != 200:
+			raise frappe.ValidationError(f"Rendering /{path.strip('/')} returned {response.status_code}")
+	finally:
+		frappe.set_user(previous_user)
+		frappe.local.request = previous_request
+		frappe.local.form_dict = previous_form_dict
+		frappe.local.no_cache = previous_no_cache
+
+
+def start_progress(total: int, full: bool = True) -> str:
+	"""Start tracking a warming of `total` pages and return its run id. A `full` warming
+	(of every published page) becomes the one `get_cache_warming_progress` reports by default."""
+	run_id = frappe.generate_hash(length=10)
+	for counter, value in (("total", total), ("done", 0), ("failed", 0)):
+		frappe.cache.set(get_progress_key(run_id, counter), value, ex=CACHE_WARMING_PROGRESS_TTL)
+	if full:
+		frappe.cache.set_value(CACHE_WARMING_LAST_RUN_KEY, run_id, expires_in_sec=CACHE_WARMING_PROGRESS_TTL)
+	return run_id
+
+
+def update_progress(run_id: str, counter: str):
+	frappe.cache.incr(get_progress_key(run_id, counter))
+
+
+def get_progress_key(run_id: str, counter: str) -> str:
+	return frappe.cache.make_key(f"{CACHE_WARMING_PROGRESS_KEY}:{run_id}:{counter}")
+
+
+def get_cache_warming_progress(run_id: str | None = None) -> dict[str, int]:
+	"""Progress of a cache warming, the last full one by default: pages to warm, warmed and failed."""
+	run_id = run_id or frappe.cache.get_value(CACHE_WARMING_LAST_RUN_KEY)
+	return {
+		counter: cint(frappe.cache.get(get_progress_key(run_id, counter))) if run_id else 0
+		for counter in ("total", "done", "failed")
+	}
@@ -0,0 +1,134 @@
+# Copyright (c) 2026, Frappe Technologies Pvt Ltd and contributors
+# For license information, please see license.txt
+
+"""Shared stylesheets for Builder Component styles.
+
+Style classes are derived from the CSS they carry (see `generate_and_apply_styles`),
+so a component renders the same classes on every page it is used on unless an
+instance overrides its styles. With "Use Shared Component Stylesheet" enabled,
+the rules of each component (per pinned version) are written once to a
+fingerprinted file under `/files/component_styles/`, linked from the pages that
+use it and left out of their inline styles, so browsers and CDNs cache them
+across pages.
+
+Files that no published page links anymore are deleted daily, once they
+haven't been used in a compilation for `COMPONENT_STYLESHEET_RETENTION`
+(`prune_component_stylesheets`).
+"""
+
+import hashlib
+import os
+import time
+
+import frappe
+from frappe.utils import get_files_path
+from frappe.website.utils import clear_website_cache
+
+import builder
+from builder.builder.component_versions import walk_blocks
+from builder.builder.render_cache import get_compiled_page
+from builder.utils import merge_raw_styles_into_base_styles
+
+COMPONENT_STYLESHEET_KEY = "builder_component_stylesheet"
+COMPONENT_STYLESHEET_FOLDER = "component_styles"
+COMPONENT_STYLESHEET_TTL = 7 * 24 * 60 * 60
+# leaves time for HTML cached outside the site (CDNs) to expire
+COMPONENT_STYLESHEET_RETENTION = 7 * 24 * 60 * 60
+
+
+def get_component_stylesheet(block_json: str | None) -> frappe._dict:
+	"""Return the shared stylesheet (`url`, `classes`) for a component's block.
+
+	Keyed by the block's content, so every pinned version and the live component
+	get their own immutable file. `url` is None if the component has no styles."""
+	digest = hashlib.sha256(f"{builder.__version__}:{block_json}".encode()).hexdigest()
+	key = f"{COMPONENT_STYLESHEET_KEY}:{digest}"
+	stylesheet = frappe.cache.get_value(key, expires=True)
+	if stylesheet is None or (stylesheet.url and not touch_stylesheet(stylesheet.url)):
+		css, classes = build_component_css(block_json)
+		stylesheet = frappe._dict(url=write_stylesheet(css) if css else None, classes=classes)
+		frappe.cache.set_value(key, stylesheet, expires_in_sec=COMPONENT_STYLESHEET_TTL)
+	return stylesheet
+
+
+def build_component_css(block_json: str | None) -> tuple[str, list[str]]:
+	"""CSS for every styled block of a component, and the style classes it defines."""
+	from builder.builder.doctype.builder_page.builder_page import (
+		get_block_styles,
+		get_style_class,
+		get_style_rules,
+		wrap_with_media_query,
+	)
+
+	rules_by_class = {}
+
+	def collect(block):
+		merge_raw_styles_into_base_styles(block)
+		if block.get("baseStyles") or block.get("tabletStyles") or block.get("mobileStyles"):
+			rules = get_style_rules(get_block_styles(block))
+			rules_by_class.setdefault(get_style_class(rules), rules)
+
+	walk_blocks(frappe.parse_json(block_json or "{}"), collect)
+	css = "".join(
+		wrap_with_media_query(f".{style_class}{selector} {{ {declarations} }}", device)
+		for style_class, rules in rules_by_class.items()
+		for device, selector, declarations in rules
+	)
+	return css, list(rules_by_class)
+
+
+def write_stylesheet(css: str) -> str:
+	file_name = f"{hashlib.sha256(css.encode()).hexdigest()[:16]}.css"
+	public_url = f"/files/{COMPONENT_STYLESHEET_FOLDER}/{file_name}"
+	file_path = get_stylesheet_path(public_url)
+	if not touch_stylesheet(public_url):
+		os.makedirs(os.path.dirname(file_path), exist_ok=True)
+		# other workers may be serving the same file, never expose a partial write
+		temp_path = f"{file_path}.{frappe.generate_hash(length=8)}.tmp"
+		with open(temp_path, "w") as f:
+			f.write(css)
+		os.replace(temp_path, file_path)
+	return public_url
+
+
+def get_stylesheet_path(public_url: str) -> str:
+	return get_files_path(f"{COMPONENT_STYLESHEET_FOLDER}/{os.path.basename(public_url)}")
+
+
+def touch_stylesheet(public_url: str) -> bool:
+	"""Mark a stylesheet as in use, False if its file is gone."""
+	try:
+		os.utime(get_stylesheet_path(public_url))
+	except FileNotFoundError:
+		return False
+	return True
+
+
+def prune_component_stylesheets():
+	"""Daily: delete the stylesheets that no published page links to and that weren't used
+	for `COMPONENT_STYLESHEET_RETENTION`, e.g. those of component styles edited since."""
+	folder = get_files_path(COMPONENT_STYLESHEET_FOLDER)
+	if not os.path.isdir(folder):
+		return
+	linked = get_linked_stylesheets()
+	expire_before = time.time() - COMPONENT_STYLESHEET_RETENTION
+	removed = False
+	for entry in os.scandir(folder):
+		if entry.is_file() and entry.name not in linked and entry.stat().st_mtime < expire_before:
+			try:
+				os.remove(entry.path)
+				removed = True
+			except FileNotFoundError:
+				pass
+	if removed:
+		# HTML cached from an earlier compilation (website and page output caches) may still link them
+		clear_website_cache()
+
+
+def get_linked_stylesheets() -> set[str]:
+	"""File names of the stylesheets that published pages are compiled with."""
+	linked = set()
+	for page in frappe.get_all("Builder Page", filters={"published": 1}, fields=["name", "blocks"]):
+		compiled = get_compiled_page(page.name, page.blocks)
+		linked.update(os.path.basename(url) for url in compiled.stylesheets)
+	return linked
@@ -18,10 +18,13 @@ not just the block layout.
 """
 
 import copy
+import hashlib
 
 import frappe
+from frappe.utils.caching import request_cache
 
 from builder.builder.doctype.builder_snapshot.builder_snapshot import (
+	get_cached_snapshot,
 	get_snapshot_data,
 	prune_snapshots,
 )
@@ -122,10 +125,16 @@ def ensure_component_version(
 			"component_data_script": values.component_data_script,
 		}
 		data_json = compact_json(data)
-
-		latest = latest_version(component_id)
-		if latest and compact_json(get_snapshot_data(latest)) == data_json:
-			version = latest
+		content_hash = get_content_hash(data)
+
+		latest = get_latest_version(component_id)
+		# the hash ignores nested pins, so only a matching one needs the stored data compared
+		if (
+			latest
+			and latest.content_hash in (content_hash, None, "")
+			and compact_json(get_snapshot_data(latest.name)) == data_json
+		):
+			version = latest.name
 		else:
 			version = (
 				frappe.get_doc(
@@ -135,6 +144,7 @@ def ensure_component_version(
 						"reference_name": component_id,
 						"snapshot_type": COMPONENT_VERSION_TYPE,
 						"data": data_json,
+						"content_hash": content_hash,
 					}
 				)
 				.insert(ignore_permissions=True)
@@ -155,18 +165,24 @@ def ensure_component_version(
 
 
 def latest_version(component_id: str) -> str | None:
-	names = frappe.get_all(
+	latest = get_latest_version(component_id)
+	return latest.name if latest else None
+
+
+def get_latest_version(component_id: str) -> frappe._dict | None:
+	"""Name and content hash of the component's latest version."""
+	versions = frappe.get_all(
 		"Builder Snapshot",
 		filters={
 			"reference_doctype": "Builder Component",
 			"reference_name": component_id,
 			"snapshot_type": COMPONENT_VERSION_TYPE,
 		},
+		fields=["name", "content_hash"],
 		order_by="creation desc",
 		limit=1,
-		pluck="name",
 	)
-	return names[0] if names else None
+	return versions[0] if versions else None
 
 
 def resolve_component(component_id: str, pinned_version: str | None = None) -> dict | None:
@@ -177,16 +193,7 @@ def resolve_component(component_id: str, pinned_version: str | None = None) -> d
 	component; component deleted -> None.
 	"""
 	if pinned_version:
-		data = frappe.db.get_value(
-			"Builder Snapshot",
-			{
-				"name": pinned_version,
-				"reference_doctype": "Builder Component",
-				"reference_name": component_id,
-				"snapshot_type": COMPONENT_VERSION_TYPE,
-			},
-			"data",
-		)
+		data = get_component_version_data(component_id, pinned_version)
 		if data:
 			return frappe.parse_json(data)
 	values = frappe.get_cached_value(
@@ -200,8 +207,76 @@ def resolve_component(component_id: str, pinned_version: str | None = None) -> d
 	}
 
 
+@request_cache
+def get_component_version_data(component_id: str, version: str) -> str | None:
+	"""Stored JSON of a component version, fetched once per request.
+
+	Versions are immutable, so a page with many instances of the same pinned
+	component only reads it once (from Redis, see `get_cached_snapshot`). The JSON
+	string is what's memoized; callers parse their own copy, which is cheaper
+	than deep copying a parsed tree and keeps `extend_block` from mutating a shared one."""
+	snapshot = get_cached_snapshot(version)
+	if (
+		snapshot
+		and snapshot.reference_doctype == "Builder Component"
+		and snapshot.reference_name == component_id
+		and snapshot.snapshot_type == COMPONENT_VERSION_TYPE
+	):
+		return snapshot.data
+
+
 def is_pin_outdated(component_id: str, pinned_version: str) -> bool:
 	"""True if the live component differs from the pinned version (ignoring pins)."""
+	return bool(get_outdated_pins([(component_id, pinned_version)]))
+
+
+def get_outdated_pins(pins: list[tuple[str, str]]) -> list[tuple[str, str]]:
+	"""Return the `(component_id, version)` pins whose live component differs from the pinned version.
+
+	Compares the content hashes stored on the components and version snapshots,
+	fetched with one query each. Rows saved before hashes existed are compared by content."""
+	pins = [(component_id, version) for component_id, version in pins if component_id and version]
+	if not pins:
+		return []
+
+	live_hashes = dict(
+		frappe.get_all(
+			"Builder Component",
+			filters={"name": ["in", list({component_id for component_id, _ in pins})]},
+			fields=["name", "content_hash"],
+			as_list=True,
+		)
+	)
+	pinned = {
+		row.name: row
+		for row in frappe.get_all(
+			"Builder Snapshot",
+			filters={
+				"name": ["in", list({version for _, version in pins})],
+				"reference_doctype": "Builder Component",
+				"snapshot_type": COMPONENT_VERSION_TYPE,
+			},
+			fields=["name", "reference_name", "content_hash"],
+		)
+	}
+
+	outdated = []
+	for component_id, version in pins:
+		snapshot = pinned.get(version)
+		if component_id not in live_hashes or not snapshot or snapshot.reference_name != component_id:
+			# deleted component or unusable pin: nothing to update to
+			continue
+		live_hash = live_hashes[component_id]
+		if live_hash and snapshot.content_hash:
+			is_outdated = live_hash != snapshot.content_hash
+		else:
+			is_outdated = pin_content_differs(component_id, version)
+		if is_outdated:
+			outdated.append((component_id, version))
+	return outdated
+
+
+def pin_content_differs(component_id: str, pinned_version: str) -> bool:
 	live = resolve_component(component_id)
 	if live is None:
 		return False
@@ -211,6 +286,11 @@ def is_pin_outdated(component_id: str, pinned_version: str) -> bool:
 	return canonical_component(live) != canonical_component(pinned)
 
 
+def get_content_hash(data: dict) -> str:
+	"""Digest of a component's fields (see `COMPONENT_VERSION_FIELDS`), ignoring pins."""
+	return hashlib.sha256(canonical_component(data).encode()).hexdigest()
+
+
 def canonical_component(data: dict) -> str:
 	"""Stable serialization for comparing two component field dicts."""
 	out = dict(data)
@@ -0,0 +1,105 @@
+# Copyright (c) 2026, Frappe Technologies Pvt Ltd and contributors
+# For license information, please see license.txt
+
+"""Deferred rendering for components with slow data scripts.
+
+Instances of a component with "Defer Rendering" enabled are compiled into a
+separate fragment, and the page gets an empty placeholder in their place. Once
+the page has loaded, the placeholder fetches its fragment from
+`render_deferred_component`, which runs the component's data script and renders
+it. A slow data script (e.g. a request to another service) no longer holds up
+the rest of the page.
+
+The placeholder carries a signed token with the props the page rendered the
+instance with, so the endpoint only renders fragments of published pages, with
+props the page produced. A deferred instance gets its props and component data,
+but not the page's data.
+"""
+
+import hashlib
+
+import frappe
+from frappe import _
+from frappe.utils.password import decrypt, encrypt
+
+from builder.builder.render_cache import get_compiled_page, render_compiled_template
+
+DEFERRED_COMPONENT_ATTRIBUTE = "data-builder-deferred"
+
+
+def is_deferred_component(component_id: str) -> bool:
+	return bool(frappe.get_cached_value("Builder Component", component_id, "defer_rendering"))
+
+
+def defer_component(tag, component_id: str, state: dict):
+	"""Move a component instance's markup into a deferred fragment and return its placeholder."""
+	from builder.builder.doctype.builder_page.builder_page import to_jinja_literal
+
+	source = (
+		f"{{% with component = get_component_data({to_jinja_literal(component_id)}, props) %}}"
+		f"{tag}{{% endwith %}}"
+	)
+	fragment_id = hashlib.sha256(source.encode()).hexdigest()[:16]
+	state["deferred_fragments"][fragment_id] = source
+
+	placeholder = state["soup"].new_tag("div")
+	# keeps the instance's box (size, margins) while it loads
+	if tag.get("class"):
+		placeholder["class"] = tag["class"]
+	placeholder[DEFERRED_COMPONENT_ATTRIBUTE] = (
+		f"{{{{ get_deferred_component_token(page_name, '{fragment_id}', "
+		"props, passed_down_props, unique_hash, block_id) }}"
+	)
+	return placeholder
+
+
+def get_deferred_component_token(
+	page_name: str, fragment_id: str, props: dict, passed_down_props: dict, unique_hash, block_id
+) -> str:
+	"""Jinja method: the token a deferred component's placeholder fetches its fragment with."""
+	payload = {
+		"page": page_name,
+		"fragment": fragment_id,
+		"context": {
+			"props": props,
+			"passed_down_props": passed_down_props,
+			"unique_hash": unique_hash,
+			"block_id": block_id,
+		},
+		# route variables of dynamic routes
+		"form_dict": {k: v for k, v in frappe.form_dict.items() if k != "cmd"},
+	}
+	return encrypt(frappe.as_json(payload, indent=None))
+
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+def render_deferred_component(deferred_token: str, query_params: dict | str | None = None) -> str:
+	"""Render the deferred component fragment a placeholder's token points to."""
+	try:
+		payload = frappe._dict(frappe.parse_json(decrypt(deferred_token)))
+	except frappe.ValidationError:
+		# decrypt's message is about the site's encryption key, not a tampered token
+		frappe.clear_last_message()
+		raise frappe.PermissionError(_("Invalid deferred component token"))
+
+	page = frappe.get_cached_doc("Builder Page", payload.page)
+	if not page.published:
+		raise frappe.DoesNotExistError(_("Page not found"))
+	if page.authenticated_access and frappe.session.user == "Guest":
+		raise frappe.PermissionError(_("Please log in to view this page."))
+
+	compiled = get_compiled_page(page.name, page.blocks)
+	source = (compiled.get("deferred_fragments") or {}).get(payload.fragment)
+	if source is None:
+		# the page was published again since the placeholder was rendered
+		raise frappe.DoesNotExistError(_("Component not found"))
+
+	# the data script sees the same form_dict as it would while rendering the page,
+	# the signed route variables can't be overridden by the query string
+	frappe.local.form_dict = frappe._dict(frappe.parse_json(query_params or "{}"))
+	frappe.local.form_dict.update(payload.form_dict or {})
+	frappe.local.builder_render_memo = {}
+	try:
+		return render_compiled_template(source, payload.context)
+	finally:
+		frappe.local.builder_render_memo = None
@@ -2,6 +2,7 @@
 # For license information, please see license.txt
 
 import copy
+import hashlib
 import os
 
 import frappe
@@ -10,8 +11,20 @@ from frappe.modules.export_file import export_to_files
 from frappe.utils.telemetry import capture
 from frappe.website.utils import clear_website_cache
 
-from builder.builder.component_versions import ensure_component_version
-from builder.utils import Block, compact_json, execute_script
+from builder.builder.component_versions import (
+	COMPONENT_VERSION_FIELDS,
+	ensure_component_version,
+	get_content_hash,
+)
+from builder.builder.doctype.builder_component_dependency.builder_component_dependency import (
+	get_dependent_pages,
+	update_component_dependencies,
+)
+from builder.builder.render_cache import bump_render_epoch
+from builder.utils import Block, compact_json, execute_script, get_render_memo
+
+COMPONENT_DATA_CACHE_KEY = "builder_component_data"
+COMPONENT_DATA_CACHE_TTL = 5 * 60
 
 
 class BuilderComponent(Document):
@@ -24,9 +37,13 @@ class BuilderComponent(Document):
 		from frappe.types import DF
 
 		block: DF.JSON | None
+		cache_component_data: DF.Check
+		component_data_cache_ttl: DF.Int
 		component_data_script: DF.Code | None
 		component_id: DF.Data | None
 		component_name: DF.Data | None
+		content_hash: DF.Data | None
+		defer_rendering: DF.Check
 		for_web_page: DF.Link | None
 	# end: auto-generated types
 
@@ -35,6 +52,9 @@ class BuilderComponent(Document):
 			self.component_id = frappe.generate_hash(length=16)
 		capture("builder_component_created", "builder")
 
+	def before_save(self):
+		self.content_hash = get_content_hash({field: self.get(field) for field in COMPONENT_VERSION_FIELDS})
+
 	def on_update(self):
 		# Skip the background cache-clear and version snapshot during bulk imports
 		# (install / migrate / import_doc). queue_action enqueues a job AND locks the
@@ -51,29 +71,39 @@ class BuilderComponent(Document):
 		):
 			self.queue_action("clear_page_cache")
 			ensure_component_version(self.name)
+		if (
+			self.has_value_changed("block")
+			or self.has_value_changed("component_data_script")
+			or self.has_value_changed("defer_rendering")
+		):
+			# unpinned instances render the live component, recompile pages. Not gated on
+			# content_hash, which ignores pins: re-pinning a nested component changes the output
+			bump_render_epoch()
 		self.update_exported_component()
 
+	def on_trash(self):
+		bump_render_epoch()
+
 	def clear_page_cache(self):
-		pages = frappe.get_all("Builder Page", filters={"published": 1}, fields=["name"])
-		for page in pages:
-			page_doc = frappe.get_cached_doc("Builder Page", page.name)
-			if page_doc.is_component_used(self.component_id):
-				clear_website_cache(page_doc.route)
+		# components nested in unpinned instances follow the live component, re-index them
+		if unpinned := get_dependent_pages(self.component_id, unpinned_only=True):
+			for page in frappe.get_all(
+				"Builder Page", filters={"name": ("in", unpinned)}, fields=["name", "blocks", "draft_blocks"]
+			):
+				update_component_dependencies(page.name, page.blocks, page.draft_blocks)
+
+		if pages := get_dependent_pages(self.component_id, published_only=True):
+			for page in frappe.get_all(
+				"Builder Page", filters={"name": ("in", pages), "published": 1}, fields=["route"]
+			):
+				clear_website_cache(page.route)
 
 	def sync_component(self):
-		# Only load pages whose blocks/draft_blocks mention this component; the
-		# precise is_component_used() check still runs below. Mirrors the filter
-		# used by Builder Settings.replace_component to avoid scanning every page.
-		pages = frappe.get_all(
-			"Builder Page",
-			fields=["name"],
-			or_filters={
-				"blocks": ["like", f"%{self.component_id}%"],
-				"draft_blocks": ["like", f"%{self.component_id}%"],
-			},
-		)
+		# pages with an instance of this component in their blocks, from the dependency
+		# index; the precise is_component_used() check still runs below
+		pages = get_dependent_pages(self.component_id, nested=False)
 		for page in pages:
-			page_doc = frappe.get_cached_doc("Builder Page", page.name)
+			page_doc = frappe.get_cached_doc("Builder Page", page)
 			if page_doc.is_component_used(self.component_id):
 				ComponentSyncer(page_doc).sync_component(self)
 
@@ -204,14 +234,39 @@ def get_component_data(
 	if not script:
 		return {}
 
-	_locals = dict(
-		component=frappe._dict(),
-		props=frappe._dict(props or {}),
-	)
+	# instances with the same script and props (e.g. cards in a repeater) share a result
+	key = get_component_data_key(component_name, script, props)
+	memo = get_render_memo("component_data")
+	if memo is not None and key in memo:
+		return frappe._dict(memo[key])
+
+	data = frappe.cache.get_value(key, expires=True) if component_doc.cache_component_data else None
+	if data is None:
+		_locals = dict(
+			component=frappe._dict(),
+			props=frappe._dict(props or {}),
+		)
+		execute_script(script, _locals, component_name)
+		data = _locals["component"]
+		if component_doc.cache_component_data:
+			frappe.cache.set_value(
+				key,
+				data,
+				expires_in_sec=component_doc.component_data_cache_ttl or COMPONENT_DATA_CACHE_TTL,
+			)
+
+	if memo is not None:
+		memo[key] = data
+	return frappe._dict(data)
 
-	execute_script(script, _locals, component_name)
 
-	return _locals["component"]
+def get_component_data_key(component_name: str, script: str, props: dict | None) -> str:
+	form_dict = {k: v for k, v in (getattr(frappe.local, "form_dict", None) or {}).items() if k != "_"}
+	# data scripts can translate (frappe._) and read the session, cached data is kept per language and user
+	digest = hashlib.sha256(
+		compact_json([script, props or {}, form_dict, frappe.local.lang, frappe.session.user]).encode()
+	).hexdigest()
+	return f"{COMPONENT_DATA_CACHE_KEY}:{component_name}:{digest}"
 
 
 def get_component_prop_values(block: dict | str | None) -> dict:
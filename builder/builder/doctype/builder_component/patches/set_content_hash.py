@@ -0,0 +1,34 @@
+import frappe
+
+from builder.builder.component_versions import (
+	COMPONENT_VERSION_FIELDS,
+	COMPONENT_VERSION_TYPE,
+	get_content_hash,
+)
+
+
+def execute():
+	"""Set Content Hash on components and component versions"""
+	for component in frappe.get_all(
+		"Builder Component",
+		filters={"content_hash": ("is", "not set")},
+		fields=["name", *COMPONENT_VERSION_FIELDS],
+	):
+		content_hash = get_content_hash({field: component.get(field) for field in COMPONENT_VERSION_FIELDS})
+		frappe.db.set_value(
+			"Builder Component", component.name, "content_hash", content_hash, update_modified=False
+		)
+
+	for snapshot in frappe.get_all(
+		"Builder Snapshot",
+		filters={
+			"reference_doctype": "Builder Component",
+			"snapshot_type": COMPONENT_VERSION_TYPE,
+			"content_hash": ("is", "not set"),
+		},
+		fields=["name", "data"],
+	):
+		content_hash = get_content_hash(frappe.parse_json(snapshot.data))
+		frappe.db.set_value(
+			"Builder Snapshot", snapshot.name, "content_hash", content_hash, update_modified=False
+		)
@@ -0,0 +1,121 @@
+# Copyright (c) 2026, Frappe Technologies Pvt Ltd and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now
+
+from builder.builder.component_versions import resolve_component, walk_blocks
+
+
+class BuilderComponentDependency(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		component: DF.Data | None
+		component_version: DF.Data | None
+		in_draft: DF.Check
+		is_nested: DF.Check
+		page: DF.Data | None
+	# end: auto-generated types
+
+	pass
+
+
+def update_component_dependencies(page_name: str, blocks: str | None, draft_blocks: str | None):
+	"""Re-index the components (and the components nested in them) a page uses."""
+	rows = {}
+	for in_draft, value in ((0, blocks), (1, draft_blocks)):
+		if value:
+			for component, version, is_nested in get_component_dependencies(value):
+				rows.setdefault((component, version or None, in_draft), is_nested)
+
+	frappe.db.delete("Builder Component Dependency", {"page": page_name})
+	if not rows:
+		return
+	timestamp, user = now(), frappe.session.user
+	frappe.db.bulk_insert(
+		"Builder Component Dependency",
+		fields=[
+			"name",
+			"page",
+			"component",
+			"component_version",
+			"is_nested",
+			"in_draft",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+		],
+		values=[
+			(
+				frappe.generate_hash(),
+				page_name,
+				component,
+				version,
+				is_nested,
+				in_draft,
+				timestamp,
+				timestamp,
+				user,
+				user,
+			)
+			for (component, version, in_draft), is_nested in rows.items()
+		],
+	)
+
+
+def get_component_dependencies(blocks: str | list | dict) -> set[tuple[str, str | None, int]]:
+	"""(component, pinned version, is nested) of every component instance in `blocks`,
+	and in the blocks of those components, as they would be rendered."""
+	dependencies = set()
+	resolved = set()
+
+	def collect(block_tree, is_nested):
+		instances = []
+
+		def add_instance(block):
+			if block.get("extendedFromComponent"):
+				instances.append((block["extendedFromComponent"], block.get("componentVersion")))
+
+		walk_blocks(
+			frappe.parse_json(block_tree) if isinstance(block_tree, str) else block_tree, add_instance
+		)
+		for component, version in instances:
+			dependencies.add((component, version, is_nested))
+			if (component, version) in resolved:
+				continue
+			resolved.add((component, version))
+			if (data := resolve_component(component, version)) and data.get("block"):
+				collect(data["block"], 1)
+
+	collect(blocks, 0)
+	# a component used both directly and nested is a direct dependency
+	return {dep for dep in dependencies if not (dep[2] and (dep[0], dep[1], 0) in dependencies)}
+
+
+def get_dependent_pages(
+	component_id: str,
+	nested: bool = True,
+	published_only: bool = False,
+	unpinned_only: bool = False,
+) -> list[str]:
+	"""Pages using a component, through the dependency index instead of scanning their blocks."""
+	filters = {"component": component_id}
+	if not nested:
+		filters["is_nested"] = 0
+	if published_only:
+		filters["in_draft"] = 0
+	if unpinned_only:
+		filters["component_version"] = ("is", "not set")
+	return frappe.get_all("Builder Component Dependency", filters=filters, pluck="page", distinct=True)
+
+
+def delete_component_dependencies(page_name: str):
+	frappe.db.delete("Builder Component Dependency", {"page": page_name})
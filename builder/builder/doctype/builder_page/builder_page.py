@@ -4,6 +4,8 @@
 import copy
 import hashlib
 import re
+import time
+from collections import OrderedDict
 from typing import Any
 from urllib.parse import quote_plus
 
@@ -15,24 +17,41 @@ from frappe.utils.caching import redis_cache
 from frappe.utils.jinja import render_template
 from frappe.utils.telemetry import capture
 from frappe.website.page_renderers.document_page import DocumentPage
-from frappe.website.path_resolver import evaluate_dynamic_routes
 from frappe.website.path_resolver import resolve_path as original_resolve_path
 from frappe.website.utils import clear_cache
 from frappe.website.website_generator import WebsiteGenerator
+from werkzeug.exceptions import NotFound
+from werkzeug.routing import Map
 
+from builder.builder.cache_warming import enqueue_cache_warming
+from builder.builder.component_stylesheet import get_component_stylesheet
 from builder.builder.component_versions import (
 	collect_restore_warnings,
 	ensure_component_version,
-	is_pin_outdated,
+	get_outdated_pins,
 	pin_components_in_page_data,
 	resolve_component,
 )
+from builder.builder.deferred_components import defer_component, is_deferred_component
+from builder.builder.doctype.builder_component_dependency.builder_component_dependency import (
+	delete_component_dependencies,
+	update_component_dependencies,
+)
 from builder.builder.doctype.builder_project_folder.builder_project_folder import is_system_activity
 from builder.builder.doctype.builder_snapshot.builder_snapshot import (
+	clear_snapshot_cache,
 	prune_snapshots,
 	take_snapshot,
 )
 from builder.builder.doctype.user_font.user_font import get_all_user_fonts
+from builder.builder.render_cache import (
+	PAGE_OUTPUT_TTL,
+	clear_page_output_cache,
+	clear_pages_by_source_doctype,
+	get_compiled_page,
+	get_page_output_key,
+	render_compiled_template,
+)
 from builder.export_import_standard_page import export_page_as_standard
 from builder.hooks import builder_path
 from builder.html_preview_image import generate_preview
@@ -56,28 +75,41 @@ MOBILE_BREAKPOINT = 576
 TABLET_BREAKPOINT = 768
 DESKTOP_BREAKPOINT = 1024
 
+ROUTE_TABLE_VERSION_KEY = "builder_route_table_version"
+# same as get_web_pages_with_dynamic_routes
+DYNAMIC_ROUTE_MAP_TTL = 60 * 60
+# site -> (route table version, expiry, werkzeug Map of dynamic routes), per worker
+_dynamic_route_maps: dict[str, tuple[str, float, Map]] = {}
+# paths that are neither a Builder Page route nor match a dynamic route, per route table version
+NON_BUILDER_PATHS_KEY = "builder_non_builder_paths"
+NON_BUILDER_PATHS_LIMIT = 10_000
+NON_BUILDER_PATHS_TTL = 24 * 60 * 60
+NON_BUILDER_PATHS_LOCAL_SIZE = 1024
+# (site, route table version, path) -> expiry, per worker
+_non_builder_paths: OrderedDict = OrderedDict()
+
 # Number of "Publish" snapshots retained per page (manual snapshots are never auto-pruned)
 KEEP_PUBLISH_SNAPSHOTS = 25
 
 
 class BuilderPageRenderer(DocumentPage):
 	def can_render(self):
+		if is_known_non_builder_path(self.path):
+			return False
+
 		if page := find_page_with_path(self.path):
 			self.doctype = "Builder Page"
 			self.docname = page
 			self.validate_access()
 			return True
 
-		for d in get_web_pages_with_dynamic_routes():
-			try:
-				if evaluate_dynamic_routes([ColonRule(f"/{d.route}", endpoint=d.name)], self.path):
-					self.doctype = "Builder Page"
-					self.docname = d.name
-					self.validate_access()
-					return True
-			except ValueError:
-				return False
+		if page := match_dynamic_route(self.path):
+			self.doctype = "Builder Page"
+			self.docname = page
+			self.validate_access()
+			return True
 
+		mark_non_builder_path(self.path)
 		return False
 
 	def validate_access(self):
@@ -86,6 +118,32 @@ class BuilderPageRenderer(DocumentPage):
 			if self.doc.authenticated_access and frappe.session.user == "Guest":
 				raise frappe.PermissionError("Please log in to view this page.")
 
+	def get_html(self):
+		key = self.get_output_cache_key()
+		if key and (html := frappe.cache.get_value(key, expires=True)) is not None:
+			return html
+
+		frappe.flags.served_stale_builder_page = False
+		html = super().get_html()
+		# the output key already has the new render epoch, don't keep a stale compilation under it
+		if key and not frappe.flags.served_stale_builder_page:
+			frappe.cache.set_value(
+				key, html, expires_in_sec=self.doc.route_params_cache_ttl or PAGE_OUTPUT_TTL
+			)
+		return html
+
+	def get_output_cache_key(self) -> str | None:
+		"""Key of the page's cached output, if this request can be served from it.
+
+		Only guests' requests without a query string are cached, so the output
+		depends on nothing but the route variables (in `form_dict`) and the language."""
+		if not (self.doc and self.doc.cache_by_route_params) or frappe.session.user != "Guest":
+			return None
+		request = getattr(frappe.local, "request", None)
+		if not request or request.method != "GET" or request.query_string:
+			return None
+		return get_page_output_key(self.doc.name, dict(frappe.form_dict))
+
 	def set_canonical_url(self):
 		if not self.doc:
 			return
@@ -120,6 +178,8 @@ class BuilderPage(WebsiteGenerator):
 		blocks: DF.LongText | None
 		body_html: DF.Code | None
 		canonical_url: DF.Data | None
+		cache_by_route_params: DF.Check
+		clear_cache_on_change_of: DF.Link | None
 		client_scripts: DF.TableMultiSelect[BuilderPageClientScript]
 		disable_indexing: DF.Check
 		draft_blocks: DF.LongText | None
@@ -139,6 +199,7 @@ class BuilderPage(WebsiteGenerator):
 		published: DF.Check
 		published_at: DF.Datetime | None
 		route: DF.Data | None
+		route_params_cache_ttl: DF.Int
 		template_group: DF.Data | None
 	# end: auto-generated types
 
@@ -214,6 +275,15 @@ class BuilderPage(WebsiteGenerator):
 		):
 			self.clear_route_cache()
 
+		if self.has_value_changed("blocks") or self.has_value_changed("draft_blocks"):
+			update_component_dependencies(self.name, self.blocks, self.draft_blocks)
+
+		clear_page_output_cache(self.name)
+		if self.has_value_changed("cache_by_route_params") or self.has_value_changed(
+			"clear_cache_on_change_of"
+		):
+			clear_pages_by_source_doctype()
+
 		if self.has_value_changed("published") and not self.published:
 			# if this is homepage then clear homepage from builder settings
 			if frappe.get_cached_value("Builder Settings", "Builder Settings", "home_page") == self.route:
@@ -235,8 +305,7 @@ class BuilderPage(WebsiteGenerator):
 			export_page_as_standard(self.name, target_app=self.app)
 
 	def clear_route_cache(self):
-		get_web_pages_with_dynamic_routes.clear_cache()
-		find_page_with_path.clear_cache()
+		clear_route_table_cache()
 		clear_cache(self.route)
 
 	def on_trash(self):
@@ -249,9 +318,14 @@ class BuilderPage(WebsiteGenerator):
 					frappe.PermissionError,
 				)
 		# clean up snapshots (reference_name is plain Data, so no link-guard removes them)
-		frappe.db.delete(
-			"Builder Snapshot", {"reference_doctype": "Builder Page", "reference_name": self.name}
-		)
+		snapshot_filters = {"reference_doctype": "Builder Page", "reference_name": self.name}
+		clear_snapshot_cache(frappe.get_all("Builder Snapshot", filters=snapshot_filters, pluck="name"))
+		frappe.db.delete("Builder Snapshot", snapshot_filters)
+		delete_component_dependencies(self.name)
+		if self.published:
+			self.clear_route_cache()
+		if self.cache_by_route_params:
+			clear_pages_by_source_doctype()
 
 	def add_comment(self, comment_type="Comment", text=None, comment_email=None, comment_by=None):
 		if comment_type in ["Attachment Removed", "Attachment"]:
@@ -290,6 +364,7 @@ class BuilderPage(WebsiteGenerator):
 			queue="short",
 			enqueue_after_commit=True,
 		)
+		enqueue_cache_warming([self.name])
 
 		return self.route
 
@@ -341,12 +416,8 @@ class BuilderPage(WebsiteGenerator):
 	def get_outdated_component_pins(self, pins: str):
 		# of the editor's pinned (component_id, version) pairs, return those whose live component changed
 		pins = frappe.parse_json(pins) if isinstance(pins, str) else pins
-		outdated = []
-		for pin in pins or []:
-			component_id, version = pin.get("component_id"), pin.get("version")
-			if component_id and version and is_pin_outdated(component_id, version):
-				outdated.append({"component_id": component_id, "version": version})
-		return outdated
+		outdated = get_outdated_pins([(pin.get("component_id"), pin.get("version")) for pin in pins or []])
+		return [{"component_id": component_id, "version": version} for component_id, version in outdated]
 
 	def get_context(self, context):
 		# delete default favicon
@@ -372,16 +443,28 @@ class BuilderPage(WebsiteGenerator):
 				"Builder Settings", "Builder Settings", "disable_auto_dark_mode"
 			)
 
+		# component data and data script queries, shared by the instances rendered on this page
+		frappe.local.builder_render_memo = {}
+
 		page_data = self._get_page_data(for_render=True)
 		if page_data.get("title"):
 			context.title = page_data.get("page_title")
 
-		blocks = self.blocks
-
-		if context.preview and self.draft_blocks:
-			blocks = self.draft_blocks
-
-		content, style, fonts, has_dual_mode_image = get_block_html(blocks)
+		if context.preview:
+			# drafts change on every edit, compile them fresh
+			content, style, fonts, has_dual_mode_image = get_block_html(self.draft_blocks or self.blocks)
+			stylesheets = []
+			context.has_deferred_components = False
+		else:
+			compiled = get_compiled_page(self.name, self.blocks)
+			stylesheets = compiled.get("stylesheets") or []
+			context.has_deferred_components = bool(compiled.get("deferred_fragments"))
+			content, style, fonts, has_dual_mode_image = (
+				compiled.content,
+				compiled.style,
+				compiled.fonts,
+				compiled.has_dual_mode_image,
+			)
 
 		if self.dynamic_route or page_data or self.page_data_script:
 			context.no_cache = 1
@@ -390,7 +473,9 @@ class BuilderPage(WebsiteGenerator):
 		self.set_custom_font(context, fonts)
 		context.font_urls = get_google_font_urls(fonts)
 		context.__content = content
-		context.style = render_template(style, page_data)
+		context.style = render_compiled_template(style, page_data)
+		if stylesheets:
+			context.setdefault("styles", []).extend(stylesheets)
 		context.editor_link = f"/{builder_path}/page/{self.name}"
 		if frappe.form_dict and self.dynamic_route:
 			query_string = "&".join(
@@ -415,7 +500,8 @@ class BuilderPage(WebsiteGenerator):
 		self.set_favicon(context)
 		self.set_language(context)
 		context.page_data = clean_data(context.page_data)
-		context["__content"] = render_template(context.__content, context)
+		context["__content"] = render_compiled_template(context.__content, context)
+		frappe.local.builder_render_memo = None
 
 	def set_meta_tags(self, context, page_data=None):
 		if not page_data:
@@ -562,6 +648,7 @@ class BuilderPage(WebsiteGenerator):
 
 		# one db_set (single commit per page) instead of one commit per field
 		if updates:
+			update_component_dependencies(self.name, self.blocks, self.draft_blocks)
 			self.db_set(updates, commit=True, update_modified=False)
 
 		self.clear_route_cache()
@@ -610,12 +697,145 @@ def get_block_data(
 	return block_data
 
 
-def get_block_html(blocks: str | list) -> tuple[str, str, dict, bool]:
+# same as BeautifulSoup's HTML tree builder
+VOID_ELEMENTS = frozenset(
+	{
+		"area",
+		"base",
+		"br",
+		"col",
+		"embed",
+		"hr",
+		"img",
+		"input",
+		"keygen",
+		"link",
+		"menuitem",
+		"meta",
+		"param",
+		"source",
+		"track",
+		"wbr",
+		"basefont",
+		"bgsound",
+		"command",
+		"frame",
+		"image",
+		"isindex",
+		"nextid",
+		"spacer",
+	}
+)
+RAW_TEXT_ELEMENTS = frozenset({"script", "style"})
+XML_ENTITIES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+
+class StreamedTag:
+	"""A tag for the streaming renderer.
+
+	Supports the subset of `bs4.Tag` the renderer uses, but holds its children
+	already serialized and writes the whole tree into a single buffer. Output is
+	identical to BeautifulSoup's "minimal" formatter: attributes sorted, `&<>`
+	escaped in text and attribute values, text inside script/style left as is.
+	"""
+
+	__slots__ = ("attrs", "contents", "name")
+
+	def __init__(self, name: str):
+		self.name = name
+		self.attrs = {}
+		self.contents = []
+
+	def __setitem__(self, key, value):
+		self.attrs[key] = value
+
+	def __getitem__(self, key):
+		return self.attrs[key]
+
+	def get(self, key, default=None):
+		return self.attrs.get(key, default)
+
+	def append(self, child: "StreamedTag | str"):
+		self.contents.append(child if isinstance(child, StreamedTag) else self.format_text(child))
+
+	def insert(self, position: int, child: "StreamedTag | str"):
+		self.contents.insert(position, child if isinstance(child, StreamedTag) else self.format_text(child))
+
+	def append_html(self, html: str):
+		self.contents.append(html)
+
+	@property
+	def string(self):
+		return "".join(c for c in self.contents if isinstance(c, str))
+
+	@string.setter
+	def string(self, text: str):
+		self.contents = [self.format_text(text)]
+
+	def format_text(self, text: str) -> str:
+		return text if self.name in RAW_TEXT_ELEMENTS else text.translate(XML_ENTITIES)
+
+	def write(self, buffer: list[str]):
+		attributes = "".join(format_attribute(k, v) for k, v in sorted(self.attrs.items()))
+		if not self.contents and self.name in VOID_ELEMENTS:
+			buffer.append(f"<{self.name}{attributes}/>")
+			return
+		buffer.append(f"<{self.name}{attributes}>")
+		for child in self.contents:
+			if isinstance(child, StreamedTag):
+				child.write(buffer)
+			else:
+				buffer.append(child)
+		buffer.append(f"</{self.name}>")
+
+	def __str__(self):
+		buffer = []
+		self.write(buffer)
+		return "".join(buffer)
+
+
+class StreamedTagFactory:
+	"""Stands in for the `BeautifulSoup` object the renderer creates tags with."""
+
+	def new_tag(self, name: str) -> StreamedTag:
+		return StreamedTag(name)
+
+
+def format_attribute(key: str, value) -> str:
+	if value is None:
+		return f" {key}"
+	if isinstance(value, list | tuple):
+		value = " ".join(value)
+	elif not isinstance(value, str):
+		value = str(value)
+	value = value.translate(XML_ENTITIES)
+	quote = '"'
+	if '"' in value:
+		if "'" in value:
+			value = value.replace('"', "&quot;")
+		else:
+			quote = "'"
+	return f" {key}={quote}{value}{quote}"
+
+
+def get_block_html(
+	blocks: str | list,
+	streaming: bool | None = None,
+	component_stylesheets: list | None = None,
+	deferred_fragments: dict | None = None,
+) -> tuple[str, str, dict, bool]:
 	"""
 	Main entry point for converting blocks to HTML.
 
 	#### Args:
 		blocks: JSON string or list of block dictionaries
+		streaming: Emit tags with `StreamedTag` instead of BeautifulSoup (same output).
+			Defaults to the "Use Streaming HTML Renderer" Builder Setting.
+		component_stylesheets: If given, component styles are served from shared
+			stylesheets (see `component_stylesheet`) whose URLs are collected here.
+		deferred_fragments: If given, instances of components with "Defer Rendering"
+			are replaced by placeholders and their fragments (see `deferred_components`)
+			are collected here by id.
 
 	#### Returns:
 		Tuple of (`html_content`, `css_styles`, `font_map`, `has_dual_mode_image`)
@@ -625,7 +845,11 @@ def get_block_html(blocks: str | list) -> tuple[str, str, dict, bool]:
 		blocks = [blocks]
 	normalize_legacy_raw_styles(blocks)
 
-	soup = bs.BeautifulSoup("", "html.parser")
+	if streaming is None:
+		streaming = frappe.get_cached_value(
+			"Builder Settings", "Builder Settings", "use_streaming_html_renderer"
+		)
+	soup = StreamedTagFactory() if streaming else bs.BeautifulSoup("", "html.parser")
 	style_tag = soup.new_tag("style")
 	font_map = {}
 
@@ -638,12 +862,18 @@ def get_block_html(blocks: str | list) -> tuple[str, str, dict, bool]:
 		"standard_props_stack": {},  # prop_name -> list of prop_info
 		"global_script_tag": soup.new_tag("script"),
 		"used_block_scripts": set(),
+		"style_classes": set(),  # style classes whose rules are already in the style tag
+		"component_stylesheets": component_stylesheets,
+		"deferred_fragments": deferred_fragments,
+		# id(block) -> (block, whether its subtree renders without any context), the block
+		# is kept so that its id isn't reused by another (e.g. a re-parsed component tree)
+		"static_blocks": {},
 	}
 
 	html_parts = []
 
 	for block in blocks:
-		block, component_id = extend_block_with_component(block)
+		block, component_id = extend_block_with_component(block, shared_state)
 		props = process_block_props(block, None, shared_state["standard_props_stack"])
 		block_context = get_block_context(block, props, component_id)
 
@@ -901,38 +1131,57 @@ def build_tag_classes(block: dict, state: dict, ancestor_font: str | None = None
 
 
 def generate_and_apply_styles(block: dict, state: dict, ancestor_font: str | None = None) -> str:
-	"""Generate a unique style class and append all styles to the style tag."""
-	style_class = f"fb-{frappe.generate_hash(length=8)}"
+	"""Get the style class for the block's styles and append its rules to the style tag.
+
+	The class is derived from the generated CSS, so blocks with the same styles
+	share a class whose rules are emitted once per page, and the output is stable
+	across renders."""
 	style_tag = state["style_tag"]
 	font_map = state["font_map"]
 
-	styles = {
-		"base": split_styles(block.get("baseStyles", {})),
-		"mobile": split_styles(block.get("mobileStyles", {})),
-		"tablet": split_styles(block.get("tabletStyles", {})),
-	}
-
+	styles = get_block_styles(block)
 	style_list = [
 		styles["base"]["regular"],
 		styles["mobile"]["regular"],
 		styles["tablet"]["regular"],
 	]
+	# fonts depend on the inherited font too, so register them for every block
 	set_fonts(style_list, font_map, inherited_font=ancestor_font)
 
-	# Append styles for different states and devices
-	# Base
-	append_style(styles["base"]["regular"], style_tag, style_class)
-	append_state_style(styles["base"]["state"], style_tag, style_class)
+	rules = get_style_rules(styles)
+	style_class = get_style_class(rules)
+	if style_class not in state["style_classes"]:
+		state["style_classes"].add(style_class)
+		for device, selector, declarations in rules:
+			style_tag.append(wrap_with_media_query(f".{style_class}{selector} {{ {declarations} }}", device))
 
-	# Tablet
-	append_style(styles["tablet"]["regular"], style_tag, style_class, device="tablet")
-	append_state_style(styles["tablet"]["state"], style_tag, style_class, device="tablet")
+	return style_class
 
-	# Mobile
-	append_style(styles["mobile"]["regular"], style_tag, style_class, device="mobile")
-	append_state_style(styles["mobile"]["state"], style_tag, style_class, device="mobile")
 
-	return style_class
+def get_block_styles(block: dict) -> dict:
+	return {
+		"base": split_styles(block.get("baseStyles", {})),
+		"mobile": split_styles(block.get("mobileStyles", {})),
+		"tablet": split_styles(block.get("tabletStyles", {})),
+	}
+
+
+def get_style_rules(styles: dict) -> list[tuple[str, str, str]]:
+	"""CSS rules for a block's split styles as `(device, selector suffix, declarations)`,
+	in cascade order: base, tablet, then mobile."""
+	rules = []
+	for device, key in (("desktop", "base"), ("tablet", "tablet"), ("mobile", "mobile")):
+		declarations = get_style(styles[key]["regular"])
+		if declarations:
+			rules.append((device, "", declarations))
+		for style_key, value in styles[key]["state"].items():
+			state, property = style_key.split(":", 1)
+			rules.append((device, f":{state}", f"{camel_case_to_kebab_case(property)}: {value};"))
+	return rules
+
+
+def get_style_class(rules: list[tuple[str, str, str]]) -> str:
+	return f"fb-{hashlib.sha256(frappe.as_json(rules).encode()).hexdigest()[:10]}"
 
 
 def add_inner_html_content(tag: bs.Tag, block: dict, state: dict, ancestor_font: str | None = None):
@@ -942,11 +1191,30 @@ def add_inner_html_content(tag: bs.Tag, block: dict, state: dict, ancestor_font:
 		# Ensure inner_content is a string before passing to BeautifulSoup
 		if not isinstance(inner_content, (str, bytes)):
 			inner_content = str(inner_content)
+		if isinstance(tag, StreamedTag) and is_plain_text(inner_content):
+			# nothing for html.parser to do but collapse whitespace-only text
+			if not inner_content.translate(ASCII_SPACES):
+				inner_content = "\n" if "\n" in inner_content else " "
+			tag.append(inner_content)
+			return
 		inner_soup = bs.BeautifulSoup(inner_content, "html.parser")
 		set_fonts_from_html(inner_soup, state["font_map"])
 		set_italics_from_html(inner_soup, state["font_map"], ancestor_font)
 		if inner_soup.contents:
-			tag.append(inner_soup)
+			if isinstance(tag, StreamedTag):
+				# serialize the parsed markup as BeautifulSoup would inside this tag
+				holder = inner_soup.new_tag(tag.name)
+				holder.append(inner_soup)
+				tag.append_html(holder.decode_contents())
+			else:
+				tag.append(inner_soup)
+
+
+ASCII_SPACES = str.maketrans("", "", "\x20\x0a\x09\x0c\x0d")
+
+
+def is_plain_text(content) -> bool:
+	return isinstance(content, str) and "<" not in content and "&" not in content
 
 
 def set_italics_from_html(soup, font_map, ancestor_font: str | None = None):
@@ -981,7 +1249,12 @@ def render_children(
 ):
 	"""Render (non-repeater) children."""
 	for child in block.get("children", []) or []:
-		child, component_id = extend_block_with_component(child)
+		child, component_id = extend_block_with_component(child, state)
+		if not component_id and is_static_subtree(child, state):
+			# nothing in it reads the render context, skip the context wrappers
+			tag.append(build_tag(child, state, ancestor_font=ancestor_font, ancestor_italic=ancestor_italic))
+			continue
+
 		child_props = process_block_props(child, data_key, state["standard_props_stack"])
 		child_context = get_block_context(child, child_props, component_id)
 		child_context["visibility_key"] = get_visibility_condition_key(child, data_key)
@@ -989,11 +1262,59 @@ def render_children(
 		child_tag = build_tag(
 			child, state, data_key, ancestor_font=ancestor_font, ancestor_italic=ancestor_italic
 		)
+		child_tag = defer_if_needed(child_tag, child_context, state)
 
 		append_child_with_context(tag, child_tag, child_context)
 		cleanup_props_stack(child_props, state["standard_props_stack"])
 
 
+def is_static_subtree(block: dict, state: dict) -> bool:
+	"""Whether the block and all its descendants render the same on every request.
+
+	Static subtrees are emitted as plain markup, without the Jinja context each
+	block is otherwise wrapped in, so a page with a data script only renders its
+	bound blocks per request."""
+	memo = state["static_blocks"].get(id(block))
+	if memo and memo[0] is block:
+		return memo[1]
+	is_static = is_static_block(block) and all(
+		is_static_subtree(child, state) for child in block.get("children") or []
+	)
+	state["static_blocks"][id(block)] = (block, is_static)
+	return is_static
+
+
+def is_static_block(block: dict) -> bool:
+	"""True if the block isn't bound to data, props or component data, has no visibility
+	condition or client script and carries no Jinja of its own."""
+	if (
+		block.get("extendedFromComponent")
+		or block.get("dynamicValues")
+		or block.get("dataKey")
+		or block.get("visibilityCondition")
+		or block.get("props")
+		or block.get("isRepeaterBlock")
+		or block.get("blockClientScript")
+		or any((block.get("clientScript") or {}).values())
+	):
+		return False
+	if (block.get("originalElement") or block.get("element")) == "body":
+		return False
+	return not has_jinja(
+		[block.get("innerHTML"), block.get("attributes"), block.get("customAttributes"), block.get("classes")]
+	)
+
+
+def has_jinja(value) -> bool:
+	if isinstance(value, str):
+		return "{{" in value or "{%" in value or "{#" in value
+	if isinstance(value, dict):
+		return any(has_jinja(v) for v in value.values())
+	if isinstance(value, list | tuple):
+		return any(has_jinja(v) for v in value)
+	return False
+
+
 def render_repeater_children(
 	tag: bs.Tag,
 	block: dict,
@@ -1008,7 +1329,11 @@ def render_repeater_children(
 	tag.append(f"{{% for {loop_info['loop_var']} in {loop_info['iterator_key']} %}}")
 
 	child = block.get("children")[0]
-	child, component_id = extend_block_with_component(child)
+	child, component_id = extend_block_with_component(child, state)
+	if not component_id and is_static_subtree(child, state):
+		tag.append(build_tag(child, state, ancestor_font=ancestor_font, ancestor_italic=ancestor_italic))
+		tag.append("{% endfor %}")
+		return
 
 	child_props = process_block_props(child, loop_info["data_key"], state["standard_props_stack"])
 	child_context = get_block_context(child, child_props, component_id)
@@ -1020,6 +1345,7 @@ def render_repeater_children(
 	child_tag = build_tag(
 		child, state, loop_info["data_key"], ancestor_font=ancestor_font, ancestor_italic=ancestor_italic
 	)
+	child_tag = defer_if_needed(child_tag, child_context, state)
 
 	append_child_with_context(tag, child_tag, child_context)
 	cleanup_props_stack(child_props, state["standard_props_stack"])
@@ -1027,6 +1353,16 @@ def render_repeater_children(
 	tag.append("{% endfor %}")
 
 
+def defer_if_needed(child_tag: bs.Tag, child_context: dict, state: dict) -> bs.Tag:
+	"""Swap a deferred component instance for its placeholder."""
+	component_id = child_context.get("component_id")
+	if not component_id or state["deferred_fragments"] is None or not is_deferred_component(component_id):
+		return child_tag
+	# the fragment fetches the component data itself, the page must not
+	child_context["component_id"] = None
+	return defer_component(child_tag, component_id, state)
+
+
 def get_loop_info(block: dict, data_key: dict | None, props_stack: dict) -> dict:
 	"""
 	Get loop information (variable name, iterator, data_key).
@@ -1313,7 +1649,7 @@ def wrap_html_with_context(html: str, context: dict) -> str:
 	return html
 
 
-def extend_block_with_component(block: dict) -> tuple[dict, str | None]:
+def extend_block_with_component(block: dict, state: dict | None = None) -> tuple[dict, str | None]:
 	if not block.get("extendedFromComponent"):
 		return block, None
 
@@ -1325,6 +1661,8 @@ def extend_block_with_component(block: dict) -> tuple[dict, str | None]:
 
 	component_block = frappe.parse_json(component.get("block") or "{}")
 	if component_block:
+		if state and state["component_stylesheets"] is not None:
+			use_component_stylesheet(component.get("block"), state)
 		extend_block(component_block, block)
 
 		return component_block, component_id
@@ -1332,6 +1670,14 @@ def extend_block_with_component(block: dict) -> tuple[dict, str | None]:
 	return block, None
 
 
+def use_component_stylesheet(block_json: str, state: dict):
+	"""Link the component's shared stylesheet instead of inlining its style rules."""
+	stylesheet = get_component_stylesheet(block_json)
+	if stylesheet.url and stylesheet.url not in state["component_stylesheets"]:
+		state["component_stylesheets"].append(stylesheet.url)
+		state["style_classes"].update(stylesheet.classes)
+
+
 def wrap_with_media_query(style_string, device):
 	if device == "mobile":
 		return f"@media only screen and (max-width: {MOBILE_BREAKPOINT}px) {{ {style_string} }}"
@@ -1357,23 +1703,6 @@ def get_style(style_obj):
 	)
 
 
-def append_style(style_obj, style_tag, style_class, device="desktop"):
-	style = get_style(style_obj)
-	if not style:
-		return
-	style_string = f".{style_class} {{ {style} }}"
-	style_tag.append(wrap_with_media_query(style_string, device))
-
-
-def append_state_style(style_obj, style_tag, style_class, device="desktop"):
-	for key, value in style_obj.items():
-		if ":" in key:
-			state, property = key.split(":", 1)
-			css_property = camel_case_to_kebab_case(property)
-			style_string = f".{style_class}:{state} {{ {css_property}: {value}; }}"
-			style_tag.append(wrap_with_media_query(style_string, device))
-
-
 def get_font_family(font: str) -> str:
 	"""Return the first family from a CSS font stack (e.g. 'Inter, sans-serif' -> 'Inter').
 	A Font design token (var(--id)) resolves to its family so the Google Fonts
@@ -1612,15 +1941,99 @@ def get_web_pages_with_dynamic_routes() -> list[dict]:
 	)
 
 
+def get_route_table_version() -> str:
+	return frappe.cache.get_value(ROUTE_TABLE_VERSION_KEY, generator=lambda: frappe.generate_hash(length=10))
+
+
+def bump_route_table_version():
+	"""Drop every worker's dynamic route map and the known non-Builder paths."""
+	frappe.cache.set_value(ROUTE_TABLE_VERSION_KEY, frappe.generate_hash(length=10))
+
+
+def clear_route_table_cache():
+	"""Call after pages were published, unpublished or moved without `BuilderPage.clear_route_cache`."""
+	get_web_pages_with_dynamic_routes.clear_cache()
+	find_page_with_path.clear_cache()
+	bump_route_table_version()
+
+
+def get_dynamic_route_map() -> Map:
+	"""A werkzeug `Map` of all published dynamic routes, built once per worker per
+	route table version (moved by `clear_route_table_cache`) and at most `DYNAMIC_ROUTE_MAP_TTL`."""
+	version = get_route_table_version()
+	cached = _dynamic_route_maps.get(frappe.local.site)
+	if cached and cached[0] == version and cached[1] > time.monotonic():
+		return cached[2]
+
+	route_map = Map()
+	for page in get_web_pages_with_dynamic_routes():
+		try:
+			route_map.add(ColonRule(f"/{page.route}", endpoint=page.name))
+		except ValueError:
+			# a malformed route shouldn't take every other dynamic route down with it
+			frappe.log_error(title=f"Invalid dynamic route for Builder Page {page.name}")
+	_dynamic_route_maps[frappe.local.site] = (version, time.monotonic() + DYNAMIC_ROUTE_MAP_TTL, route_map)
+	return route_map
+
+
+def match_dynamic_route(path: str) -> str | None:
+	"""Return the Builder Page whose dynamic route matches `path`, like `evaluate_dynamic_routes`
+	(sets the route params in `form_dict`), with a single prebuilt map.
+
+	Werkzeug orders the rules, so static segments win over variables regardless of
+	the order pages were published in; identical routes go to the most recently modified page."""
+	request = getattr(frappe.local, "request", None)
+	if not (request and request.environ):
+		return None
+	try:
+		endpoint, args = get_dynamic_route_map().bind_to_environ(request.environ).match("/" + path)
+	except NotFound:
+		return None
+	if args:
+		# don't cache when there's a query string!
+		frappe.local.no_cache = 1
+		frappe.local.form_dict.update(args)
+	return endpoint
+
+
+def is_known_non_builder_path(path: str) -> bool:
+	"""True if `path` was already looked up and isn't a Builder route. Checked in
+	this worker first, then in the set shared by all workers in Redis."""
+	version = get_route_table_version()
+	local_key = (frappe.local.site, version, path)
+	if (expiry := _non_builder_paths.get(local_key)) is not None:
+		if expiry > time.monotonic():
+			_non_builder_paths.move_to_end(local_key)
+			return True
+		del _non_builder_paths[local_key]
+	if frappe.cache.sismember(f"{NON_BUILDER_PATHS_KEY}:{version}", path):
+		remember_non_builder_path(local_key)
+		return True
+	return False
+
+
+def mark_non_builder_path(path: str):
+	version = get_route_table_version()
+	remember_non_builder_path((frappe.local.site, version, path))
+	key = frappe.cache.make_key(f"{NON_BUILDER_PATHS_KEY}:{version}")
+	# bounded, since any missing path (crawlers, scanners) would end up here
+	if frappe.cache.scard(key) < NON_BUILDER_PATHS_LIMIT:
+		frappe.cache.sadd(f"{NON_BUILDER_PATHS_KEY}:{version}", path)
+		frappe.cache.expire(key, NON_BUILDER_PATHS_TTL)
+
+
+def remember_non_builder_path(local_key: tuple):
+	_non_builder_paths[local_key] = time.monotonic() + NON_BUILDER_PATHS_TTL
+	if len(_non_builder_paths) > NON_BUILDER_PATHS_LOCAL_SIZE:
+		_non_builder_paths.popitem(last=False)
+
+
 def resolve_path(path):
 	try:
-		if find_page_with_path(path):
-			return path
-		elif evaluate_dynamic_routes(
-			[ColonRule(f"/{d.route}", endpoint=d.name) for d in get_web_pages_with_dynamic_routes()],
-			path,
-		):
-			return path
+		if not is_known_non_builder_path(path):
+			if find_page_with_path(path) or match_dynamic_route(path):
+				return path
+			mark_non_builder_path(path)
 	except Exception:
 		pass
 
@@ -0,0 +1,12 @@
+import frappe
+
+from builder.builder.doctype.builder_component_dependency.builder_component_dependency import (
+	update_component_dependencies,
+)
+
+
+def execute():
+	"""Index the components used by existing pages"""
+	for page_name in frappe.get_all("Builder Page", pluck="name"):
+		page = frappe.db.get_value("Builder Page", page_name, ["blocks", "draft_blocks"], as_dict=True)
+		update_component_dependencies(page_name, page.blocks, page.draft_blocks)
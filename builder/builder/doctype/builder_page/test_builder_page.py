@@ -132,6 +132,90 @@ class TestBuilderPage(FrappeTestCase):
 		content = get_html_for_route("/test-page-dynamic-route/123")
 		self.assertTrue("Dynamic Content!" in content)
 
+	def test_dynamic_route_map_is_built_once(self):
+		from unittest.mock import patch
+
+		from frappe.utils import set_request
+
+		from builder.builder.doctype.builder_page import builder_page
+
+		previous = getattr(frappe.local, "request", None)
+		try:
+			set_request(path="/test-page-dynamic-route/123")
+			self.assertEqual(
+				builder_page.match_dynamic_route("test-page-dynamic-route/123"),
+				self.page_with_dynamic_route.name,
+			)
+			self.assertEqual(frappe.form_dict.name, "123")
+
+			with patch.object(builder_page, "get_web_pages_with_dynamic_routes") as get_pages:
+				self.assertEqual(
+					builder_page.match_dynamic_route("test-page-dynamic-route/456"),
+					self.page_with_dynamic_route.name,
+				)
+				self.assertIsNone(builder_page.match_dynamic_route("not-a-builder-route/1"))
+				get_pages.assert_not_called()
+
+				# publishing changes the route table
+				self.page_with_dynamic_route.clear_route_cache()
+				builder_page.match_dynamic_route("test-page-dynamic-route/789")
+				get_pages.assert_called_once()
+		finally:
+			frappe.local.request = previous
+
+	def test_non_builder_paths_skip_route_lookup(self):
+		from unittest.mock import patch
+
+		from builder.builder.doctype.builder_page import builder_page
+
+		path = f"not-a-builder-page-{frappe.generate_hash(length=6)}"
+		builder_page.resolve_path(path)
+		self.assertTrue(builder_page.is_known_non_builder_path(path))
+
+		builder_page._non_builder_paths.clear()
+		with patch.object(builder_page, "find_page_with_path") as find_page:
+			# still known from the shared set
+			builder_page.resolve_path(path)
+			find_page.assert_not_called()
+
+		page = frappe.get_doc(
+			{
+				"doctype": "Builder Page",
+				"page_title": "Previously Missing Page",
+				"published": 1,
+				"route": path,
+				"blocks": Block(element="div", originalElement="body").as_json(wrap_in_array=True),
+			}
+		).insert()
+		try:
+			self.assertFalse(builder_page.is_known_non_builder_path(path))
+			self.assertEqual(builder_page.resolve_path(path), path)
+		finally:
+			page.delete()
+
+	def test_non_builder_paths_are_forgotten(self):
+		import time
+		from unittest.mock import patch
+
+		from builder.builder.doctype.builder_page import builder_page
+		from builder.builder.render_cache import clear_render_cache
+
+		path = f"not-a-builder-page-{frappe.generate_hash(length=6)}"
+		builder_page.mark_non_builder_path(path)
+		# a full website cache clear, e.g. after a template sync published pages
+		clear_render_cache()
+		self.assertFalse(builder_page.is_known_non_builder_path(path))
+
+		builder_page.mark_non_builder_path(path)
+		frappe.cache.delete_value(
+			f"{builder_page.NON_BUILDER_PATHS_KEY}:{builder_page.get_route_table_version()}"
+		)
+		self.assertTrue(builder_page.is_known_non_builder_path(path))
+		later = time.monotonic() + builder_page.NON_BUILDER_PATHS_TTL + 1
+		with patch.object(builder_page.time, "monotonic", return_value=later):
+			# expired in this worker too
+			self.assertFalse(builder_page.is_known_non_builder_path(path))
+
 	def test_publish_unpublish(self):
 		self.page.unpublish()
 		# An unpublished route is "not found". The rendered body varies (a site may
@@ -427,6 +511,71 @@ class TestBuilderPage(FrappeTestCase):
 			page_with_component_having_bad_overrides.delete()
 			component.delete()
 
+	def test_component_data_is_computed_once_per_props(self):
+		from unittest.mock import patch
+
+		from builder.builder.doctype.builder_component import builder_component
+
+		component = frappe.get_doc(
+			{
+				"doctype": "Builder Component",
+				"block": Block(element="div", innerHTML="Card").as_json(),
+				"component_data_script": component_data_script,
+			}
+		).insert()
+		body = Block(element="div", originalElement="body")
+		body.attach_children(*(Block(extendedFromComponent=component.name) for _ in range(3)))
+		page = frappe.get_doc(
+			{
+				"doctype": "Builder Page",
+				"page_title": "Component Data Memo Test",
+				"published": 1,
+				"route": "/component-data-memo-test",
+				"blocks": body.as_json(wrap_in_array=True),
+			}
+		).insert()
+
+		try:
+			with patch.object(
+				builder_component, "execute_script", wraps=builder_component.execute_script
+			) as execute_script:
+				content = get_response_content("/component-data-memo-test")
+				self.assertEqual(execute_script.call_count, 1)
+				self.assertEqual(content.count("Card"), 3)
+
+				# without the opt-in cache the next request runs the script again
+				frappe.local.builder_render_memo = None
+				builder_component.get_component_data(component.name)
+				self.assertEqual(execute_script.call_count, 2)
+
+				component.cache_component_data = 1
+				component.save()
+				builder_component.get_component_data(component.name)
+				builder_component.get_component_data(component.name)
+				self.assertEqual(execute_script.call_count, 3)
+
+				# translated or personalized data isn't shared across languages and users
+				previous_lang = frappe.local.lang
+				frappe.local.lang = "de"
+				try:
+					builder_component.get_component_data(component.name)
+				finally:
+					frappe.local.lang = previous_lang
+				self.assertEqual(execute_script.call_count, 4)
+				frappe.set_user("Guest")
+				try:
+					builder_component.get_component_data(component.name)
+				finally:
+					frappe.set_user("Administrator")
+				self.assertEqual(execute_script.call_count, 5)
+		finally:
+			page.delete()
+			component.delete()
+			frappe.db.delete(
+				"Builder Snapshot",
+				{"reference_doctype": "Builder Component", "reference_name": component.name},
+			)
+
 	def test_visibility_condition_from_page_data(self):
 		body = Block(
 			element="div",
@@ -816,6 +965,167 @@ component.update({
 				{"reference_doctype": "Builder Component", "reference_name": component.name},
 			)
 
+	def test_pinned_component_version_is_read_once_per_request(self):
+		from unittest.mock import patch
+
+		from builder.builder.doctype.builder_page.builder_page import get_block_html
+
+		component = frappe.get_doc(
+			{
+				"doctype": "Builder Component",
+				"block": Block(element="div", innerHTML="Pinned Card").as_json(),
+			}
+		).insert()
+		pinned_version = ensure_component_version(component.name)
+		body = Block(element="div", originalElement="body")
+		body.attach_children(
+			*(Block(extendedFromComponent=component.name, componentVersion=pinned_version) for _ in range(5))
+		)
+
+		try:
+			frappe.local.request_cache.clear()
+			with patch.object(frappe.db, "get_value", wraps=frappe.db.get_value) as get_value:
+				html, _, _, _ = get_block_html(body.as_json(wrap_in_array=True))
+			snapshot_reads = [c for c in get_value.call_args_list if c.args[0] == "Builder Snapshot"]
+			self.assertEqual(len(snapshot_reads), 1)
+			self.assertEqual(html.count("Pinned Card"), 5)
+		finally:
+			component.delete()
+			frappe.db.delete(
+				"Builder Snapshot",
+				{"reference_doctype": "Builder Component", "reference_name": component.name},
+			)
+
+	def test_component_version_snapshot_is_cached(self):
+		from unittest.mock import patch
+
+		from builder.builder.component_versions import resolve_component
+		from builder.builder.doctype.builder_snapshot.builder_snapshot import get_cached_snapshot
+
+		component = frappe.get_doc(
+			{
+				"doctype": "Builder Component",
+				"block": Block(element="div", innerHTML="Cached Version").as_json(),
+			}
+		).insert()
+		version = ensure_component_version(component.name)
+
+		try:
+			get_cached_snapshot(version)
+			frappe.local.request_cache.clear()
+			with patch.object(frappe.db, "get_value", wraps=frappe.db.get_value) as get_value:
+				data = resolve_component(component.name, version)
+				get_value.assert_not_called()
+			self.assertIn("Cached Version", data["block"])
+
+			frappe.delete_doc("Builder Snapshot", version)
+			self.assertIsNone(get_cached_snapshot(version))
+		finally:
+			component.delete()
+			frappe.db.delete(
+				"Builder Snapshot",
+				{"reference_doctype": "Builder Component", "reference_name": component.name},
+			)
+
+	def test_get_outdated_component_pins(self):
+		components = [
+			frappe.get_doc(
+				{
+					"doctype": "Builder Component",
+					"block": Block(element="div", innerHTML=f"Card {i}").as_json(),
+				}
+			).insert()
+			for i in range(3)
+		]
+		pins = [{"component_id": c.name, "version": ensure_component_version(c.name)} for c in components]
+
+		try:
+			self.assertEqual(self.page.get_outdated_component_pins(frappe.as_json(pins)), [])
+
+			components[1].block = Block(element="div", innerHTML="Card 1 (updated)").as_json()
+			components[1].save()
+			outdated = self.page.get_outdated_component_pins(frappe.as_json(pins))
+			self.assertEqual(outdated, [pins[1]])
+
+			# pins to versions saved before content hashes existed are compared by content
+			frappe.db.set_value("Builder Snapshot", pins[0]["version"], "content_hash", None)
+			frappe.db.set_value("Builder Snapshot", pins[1]["version"], "content_hash", None)
+			outdated = self.page.get_outdated_component_pins(frappe.as_json(pins))
+			self.assertEqual(outdated, [pins[1]])
+		finally:
+			for component in components:
+				component.delete()
+				frappe.db.delete(
+					"Builder Snapshot",
+					{"reference_doctype": "Builder Component", "reference_name": component.name},
+				)
+
+	def test_component_version_dedup_by_content_hash(self):
+		from unittest.mock import patch
+
+		component = frappe.get_doc(
+			{"doctype": "Builder Component", "block": Block(element="div", innerHTML="v1").as_json()}
+		).insert()
+		target = "builder.builder.component_versions.get_snapshot_data"
+
+		try:
+			version = ensure_component_version(component.name)
+			self.assertTrue(frappe.db.get_value("Builder Snapshot", version, "content_hash"))
+			self.assertEqual(ensure_component_version(component.name), version)
+
+			component.block = Block(element="div", innerHTML="v2").as_json()
+			component.save()
+			# a different hash means a new version, without loading the latest one
+			frappe.db.set_value("Builder Component", component.name, "block", Block(element="p").as_json())
+			frappe.clear_document_cache("Builder Component", component.name)
+			with patch(target) as get_snapshot_data:
+				new_version = ensure_component_version(component.name)
+				get_snapshot_data.assert_not_called()
+			self.assertNotEqual(new_version, version)
+		finally:
+			component.delete()
+			frappe.db.delete(
+				"Builder Snapshot",
+				{"reference_doctype": "Builder Component", "reference_name": component.name},
+			)
+
+	def test_repinning_nested_component_recompiles_pages(self):
+		from builder.builder.render_cache import get_compiled_page_key
+
+		inner = frappe.get_doc(
+			{"doctype": "Builder Component", "block": Block(element="span", innerHTML="Inner v1").as_json()}
+		).insert()
+		first_version = ensure_component_version(inner.name)
+		inner.block = Block(element="span", innerHTML="Inner v2").as_json()
+		inner.save()
+		second_version = ensure_component_version(inner.name)
+
+		outer_block = Block(element="div")
+		outer_block.attach_children(Block(extendedFromComponent=inner.name, componentVersion=first_version))
+		outer = frappe.get_doc({"doctype": "Builder Component", "block": outer_block.as_json()}).insert()
+		body = Block(element="div", originalElement="body")
+		body.attach_children(Block(extendedFromComponent=outer.name))
+		blocks = body.as_json(wrap_in_array=True)
+
+		try:
+			key = get_compiled_page_key(self.page.name, blocks)
+			outer_block = Block(element="div")
+			outer_block.attach_children(
+				Block(extendedFromComponent=inner.name, componentVersion=second_version)
+			)
+			outer.block = outer_block.as_json()
+			outer.save()
+			# pins don't count towards the content hash, but they change what is rendered
+			self.assertFalse(outer.has_value_changed("content_hash"))
+			self.assertNotEqual(get_compiled_page_key(self.page.name, blocks), key)
+		finally:
+			for component in (outer, inner):
+				component.delete()
+				frappe.db.delete(
+					"Builder Snapshot",
+					{"reference_doctype": "Builder Component", "reference_name": component.name},
+				)
+
 	def test_component_props(self):
 		component_root = Block(element="div", blockId="wrapper-block")
 		content_static_prop = Block(
@@ -1513,7 +1823,7 @@ component.update({
 			}
 		]
 
-		# CSS class names are a random hash per render (frappe.generate_hash) — ignore them.
+		# CSS class names are a hash of the generated CSS — ignore them.
 		def normalize(text):
 			return re.sub(r"[0-9a-f]{8,}", "H", text)
 
@@ -1735,6 +2045,598 @@ component.update({
 			page_first.delete()
 			page_second.delete()
 
+	def test_compiled_page_is_reused_until_render_epoch_changes(self):
+		from unittest.mock import patch
+
+		from builder.builder import render_cache
+
+		compiled = render_cache.get_compiled_page(self.page.name, self.page.blocks)
+		self.assertIn("Hello World!", compiled.content)
+
+		target = "builder.builder.doctype.builder_page.builder_page.get_block_html"
+		with patch(target) as get_block_html:
+			cached = render_cache.get_compiled_page(self.page.name, self.page.blocks)
+			get_block_html.assert_not_called()
+		self.assertEqual(cached.content, compiled.content)
+		self.assertEqual(cached.style, compiled.style)
+
+		render_cache.bump_render_epoch()
+		with patch(target, return_value=("", "", {}, False)) as get_block_html:
+			render_cache.get_compiled_page(self.page.name, self.page.blocks)
+			get_block_html.assert_called_once()
+
+	def test_stale_compiled_page_is_served_while_rebuilding(self):
+		from unittest.mock import patch
+
+		from builder.builder import render_cache
+
+		frappe.db.set_single_value("Builder Settings", "serve_stale_pages", 1)
+		try:
+			compiled = render_cache.get_compiled_page(self.page.name, self.page.blocks)
+			render_cache.bump_render_epoch()
+
+			target = "builder.builder.doctype.builder_page.builder_page.get_block_html"
+			with patch(target) as get_block_html, patch.object(frappe, "enqueue") as enqueue:
+				stale = render_cache.get_compiled_page(self.page.name, self.page.blocks)
+				self.assertEqual(stale.content, compiled.content)
+				# the rebuild is already queued
+				render_cache.get_compiled_page(self.page.name, self.page.blocks)
+				enqueue.assert_called_once()
+				get_block_html.assert_not_called()
+
+			render_cache.rebuild_compiled_page(self.page.name)
+			key = render_cache.get_compiled_page_key(self.page.name, self.page.blocks)
+			self.assertIsNotNone(frappe.cache.get_value(key, expires=True))
+			self.assertTrue(render_cache.acquire_compile_lock(self.page.name))
+			render_cache.release_compile_lock(self.page.name)
+		finally:
+			frappe.db.set_single_value("Builder Settings", "serve_stale_pages", 0)
+
+	def test_cache_warming(self):
+		from unittest.mock import patch
+
+		from builder.builder import cache_warming, render_cache
+
+		views = {"test-page-dynamic-route/1": 10, "test-page": 5, "test-page-dynamic-route/2": 3}
+		with patch("builder.builder_analytics.get_recent_views_by_path", return_value=views):
+			targets = cache_warming.get_warming_targets([self.page.name, self.page_with_dynamic_route.name])
+		self.assertEqual(
+			targets,
+			[
+				{
+					"page": self.page_with_dynamic_route.name,
+					"paths": ["test-page-dynamic-route/1", "test-page-dynamic-route/2"],
+				},
+				{"page": self.page.name, "paths": [self.page.route]},
+			],
+		)
+
+		render_cache.bump_render_epoch()
+		run_id = cache_warming.start_progress(1)
+		cache_warming.warm_pages(targets[1:], run_id)
+		key = render_cache.get_compiled_page_key(self.page.name, self.page.blocks)
+		self.assertIsNotNone(frappe.cache.get_value(key, expires=True))
+		self.assertEqual(cache_warming.get_cache_warming_progress(), {"total": 1, "done": 1, "failed": 0})
+
+		# warming a single page, e.g. after a publish, leaves the full warming's progress alone
+		page_run_id = cache_warming.start_progress(1, full=False)
+		cache_warming.update_progress(page_run_id, "failed")
+		self.assertEqual(cache_warming.get_cache_warming_progress(), {"total": 1, "done": 1, "failed": 0})
+		self.assertEqual(
+			cache_warming.get_cache_warming_progress(page_run_id), {"total": 1, "done": 0, "failed": 1}
+		)
+		self.assertEqual(frappe.session.user, "Administrator")
+
+	def test_cache_warming_renders_each_path_afresh(self):
+		from unittest.mock import patch
+
+		from builder.builder import cache_warming
+
+		get_response = cache_warming.get_response
+		rendered = []
+
+		def record_request_state(path):
+			rendered.append((path, dict(frappe.local.form_dict), frappe.local.no_cache))
+			return get_response(path)
+
+		targets = [
+			{"page": self.page_with_dynamic_route.name, "paths": ["test-page-dynamic-route/1"]},
+			{"page": self.page.name, "paths": [self.page.route]},
+		]
+		run_id = cache_warming.start_progress(len(targets))
+		with patch.object(cache_warming, "get_response", side_effect=record_request_state):
+			cache_warming.warm_pages(targets, run_id)
+		self.assertEqual(
+			cache_warming.get_cache_warming_progress(run_id), {"total": 2, "done": 2, "failed": 0}
+		)
+		# the dynamic route's variables and no_cache don't carry over to the next page
+		self.assertEqual(rendered[1], (f"/{self.page.route}", {}, 0))
+
+		# an error page doesn't count as warmed
+		run_id = cache_warming.start_progress(1)
+		with patch.object(cache_warming, "get_response", return_value=frappe._dict(status_code=500)):
+			cache_warming.warm_pages(targets[1:], run_id)
+		self.assertEqual(
+			cache_warming.get_cache_warming_progress(run_id), {"total": 1, "done": 0, "failed": 1}
+		)
+
+	def test_render_compiled_template(self):
+		from builder.builder.render_cache import render_compiled_template
+
+		source = "<h1>{{ title }}</h1>"
+		self.assertEqual(render_compiled_template(source, {"title": "One"}), "<h1>One</h1>")
+		self.assertEqual(render_compiled_template(source, {"title": "Two"}), "<h1>Two</h1>")
+		self.assertRaises(frappe.ValidationError, render_compiled_template, "{{ ''.__class__ }}", {})
+
+	def test_streaming_renderer_matches_beautifulsoup(self):
+		from builder.builder.doctype.builder_page.builder_page import get_block_html
+
+		body = Block(element="div", originalElement="body", baseStyles={"display": "flex"})
+		heading = Block(
+			element="h1",
+			baseStyles={"fontFamily": "Inter", "fontStyle": "italic"},
+			innerHTML="Tom & Jerry > <b style=\"font-family: 'Roboto'\">Spike</b> &amp; <!-- note -->",
+		)
+		plain = Block(element="p", innerHTML="Plain text, no markup", mobileStyles={"color": "red"})
+		blank = Block(element="span", innerHTML="  \n  ")
+		image = Block(
+			element="img",
+			attributes={"src": "/files/a.png?x=1&y=2", "darkSrc": "/files/b.png", "alt": 'say "hi"'},
+		)
+		link = Block(
+			element="a",
+			attributes={"href": "/a?b=1&c=2", "title": 'it\'s "quoted"'},
+			customAttributes={"data-track": "1", "aria-label": "Open <menu>"},
+			clientScript={"js": "console.log(1 < 2 && '</script>');", "css": "a { color: red }"},
+			innerText="Open",
+		)
+		items = Block(
+			element="div",
+			isRepeaterBlock=True,
+			dataKey={"key": "items", "type": "key", "comesFrom": "dataScript"},
+		)
+		item = Block(
+			element="p",
+			dataKey={"key": "name", "type": "key", "property": "innerHTML", "comesFrom": "dataScript"},
+		)
+		items.attach_children(item)
+		body.attach_children(heading, plain, blank, image, link, items, Block(element="br"))
+		blocks = frappe.parse_json(body.as_json(wrap_in_array=True))
+		blocks.append(frappe.parse_json(Block(element="footer", clientScript={"js": "init()"}).as_json()))
+
+		# style classes are content-addressed, both emitters must produce the same ones
+		self.assertEqual(
+			get_block_html(frappe.as_json(blocks), True), get_block_html(frappe.as_json(blocks), False)
+		)
+
+	def test_style_classes_are_content_addressed(self):
+		import re
+
+		from builder.builder.doctype.builder_page.builder_page import get_block_html
+
+		body = Block(element="div", originalElement="body")
+		cards = [
+			Block(
+				element="div",
+				baseStyles={"color": "red", "hover:color": "blue"},
+				mobileStyles={"padding": "4px"},
+			)
+			for _ in range(3)
+		]
+		other = Block(element="div", baseStyles={"color": "green"})
+		body.attach_children(*cards, other)
+		blocks = body.as_json(wrap_in_array=True)
+
+		html, css, _, _ = get_block_html(blocks)
+		style_classes = re.findall(r'class="(fb-[0-9a-f]+)', html)
+		self.assertEqual(len(style_classes), 4)
+		card_class = style_classes[0]
+		self.assertEqual(style_classes[:3], [card_class] * 3)
+		self.assertNotEqual(style_classes[3], card_class)
+		self.assertEqual(css.count(f".{card_class} {{ color: red; }}"), 1)
+		self.assertEqual(css.count(f".{card_class}:hover {{ color: blue; }}"), 1)
+		self.assertIn("color: green;", css)
+
+		# stable across renders
+		self.assertEqual(get_block_html(blocks)[:2], (html, css))
+
+	def test_shared_component_stylesheet(self):
+		import os
+
+		from builder.builder.component_stylesheet import get_stylesheet_path
+		from builder.builder.doctype.builder_page.builder_page import get_block_html
+
+		component = frappe.get_doc(
+			{
+				"doctype": "Builder Component",
+				"block": Block(element="div", baseStyles={"color": "rebeccapurple"}).as_json(),
+			}
+		).insert()
+		stylesheets = []
+		try:
+			body = Block(element="div", originalElement="body")
+			body.attach_children(
+				Block(extendedFromComponent=component.name),
+				Block(extendedFromComponent=component.name, baseStyles={"color": "teal"}),
+			)
+			blocks = body.as_json(wrap_in_array=True)
+
+			_, css, _, _ = get_block_html(blocks, component_stylesheets=stylesheets)
+			self.assertEqual(len(stylesheets), 1)
+			with open(get_stylesheet_path(stylesheets[0])) as f:
+				self.assertIn("color: rebeccapurple;", f.read())
+			self.assertNotIn("rebeccapurple", css)
+			# overridden instances keep their styles inline
+			self.assertIn("color: teal;", css)
+
+			# same component, same file
+			same_stylesheets = []
+			get_block_html(blocks, component_stylesheets=same_stylesheets)
+			self.assertEqual(same_stylesheets, stylesheets)
+
+			_, inline_css, _, _ = get_block_html(blocks)
+			self.assertIn("color: rebeccapurple;", inline_css)
+		finally:
+			component.delete()
+			for url in stylesheets:
+				os.remove(get_stylesheet_path(url))
+
+	def test_prune_component_stylesheets(self):
+		import os
+		import time
+
+		from builder.builder import render_cache
+		from builder.builder.component_stylesheet import (
+			COMPONENT_STYLESHEET_RETENTION,
+			get_stylesheet_path,
+			prune_component_stylesheets,
+			write_stylesheet,
+		)
+
+		component = frappe.get_doc(
+			{
+				"doctype": "Builder Component",
+				"block": Block(element="div", baseStyles={"color": "salmon"}).as_json(),
+			}
+		).insert()
+		body = Block(element="div", originalElement="body")
+		body.attach_children(Block(extendedFromComponent=component.name))
+		page = frappe.get_doc(
+			{
+				"doctype": "Builder Page",
+				"page_title": "Pruned Stylesheet Test",
+				"published": 1,
+				"route": "/pruned-stylesheet-test",
+				"blocks": body.as_json(wrap_in_array=True),
+			}
+		).insert()
+		frappe.db.set_single_value("Builder Settings", "use_shared_component_stylesheet", 1)
+		render_cache.bump_render_epoch()
+
+		unused = get_stylesheet_path(write_stylesheet(".fb-pruned { color: olive; }"))
+		url = None
+		try:
+			# served from the website cache from now on, the page isn't compiled again
+			get_response_content("/pruned-stylesheet-test")
+			url = render_cache.get_compiled_page(page.name, page.blocks).stylesheets[0]
+			linked = get_stylesheet_path(url)
+			expired = time.time() - COMPONENT_STYLESHEET_RETENTION - 60
+			for path in (unused, linked):
+				os.utime(path, (expired, expired))
+
+			prune_component_stylesheets()
+			self.assertFalse(os.path.exists(unused))
+			self.assertTrue(os.path.exists(linked))
+			self.assertIn(url, get_response_content("/pruned-stylesheet-test"))
+		finally:
+			frappe.db.set_single_value("Builder Settings", "use_shared_component_stylesheet", 0)
+			render_cache.bump_render_epoch()
+			page.delete()
+			component.delete()
+			frappe.db.delete(
+				"Builder Snapshot",
+				{"reference_doctype": "Builder Component", "reference_name": component.name},
+			)
+			for path in (unused, get_stylesheet_path(url) if url else None):
+				if path and os.path.exists(path):
+					os.remove(path)
+
+	def test_deferred_component(self):
+		import re
+
+		from frappe.utils.password import decrypt, encrypt
+
+		from builder.builder.deferred_components import render_deferred_component
+
+		component_root = Block(element="div", innerHTML="Loading")
+		component_root.set_dynamic_value("name", "key", "innerHTML", "componentData")
+		component = frappe.get_doc(
+			{
+				"doctype": "Builder Component",
+				"block": component_root.as_json(),
+				"component_data_script": component_data_script,
+				"defer_rendering": 1,
+			}
+		).insert()
+		body = Block(element="div", originalElement="body")
+		body.attach_children(Block(extendedFromComponent=component.name))
+		page = frappe.get_doc(
+			{
+				"doctype": "Builder Page",
+				"page_title": "Deferred Component Test",
+				"published": 1,
+				"route": "/deferred-component-test",
+				"blocks": body.as_json(wrap_in_array=True),
+			}
+		).insert()
+
+		try:
+			content = get_response_content("/deferred-component-test")
+			self.assertNotIn("John Doe", content)
+			token = re.search(r'data-builder-deferred="([^"]+)"', content).group(1)
+			self.assertIn("John Doe", render_deferred_component(token))
+
+			# signed route variables win over the query string
+			payload = frappe.parse_json(decrypt(token))
+			payload["form_dict"] = {"slug": "signed"}
+			signed_token = encrypt(frappe.as_json(payload, indent=None))
+			render_deferred_component(signed_token, {"slug": "forged", "page": "2"})
+			self.assertEqual(frappe.form_dict.slug, "signed")
+			self.assertEqual(frappe.form_dict.page, "2")
+
+			self.assertRaises(frappe.PermissionError, render_deferred_component, token[:-4] + "abcd")
+		finally:
+			frappe.local.builder_render_memo = None
+			page.delete()
+			component.delete()
+			frappe.db.delete(
+				"Builder Snapshot",
+				{"reference_doctype": "Builder Component", "reference_name": component.name},
+			)
+
+	def test_static_subtrees_skip_render_context(self):
+		from builder.builder.doctype.builder_page.builder_page import get_block_html
+
+		body = Block(element="div", originalElement="body")
+		footer = Block(element="footer", blockId="static-footer")
+		footer.attach_children(Block(element="p", blockId="static-text", innerHTML="All rights reserved"))
+		greeting = Block(element="h1", blockId="bound-greeting", innerHTML="Hello")
+		greeting.set_dynamic_value("name", "key", "innerHTML")
+		body.attach_children(greeting, footer)
+
+		html, _, _, _ = get_block_html(body.as_json(wrap_in_array=True))
+		self.assertIn("{% with block_id = 'bound-greeting' %}", html)
+		self.assertNotIn("{% with block_id = 'static-footer' %}", html)
+		self.assertNotIn("{% with block_id = 'static-text' %}", html)
+		self.assertIn("All rights reserved", html)
+
+		# a block carrying Jinja of its own still gets the context
+		footer.children[0].innerHTML = "{{ name }}"
+		html, _, _, _ = get_block_html(body.as_json(wrap_in_array=True))
+		self.assertIn("{% with block_id = 'static-footer' %}", html)
+
+	def test_static_and_dynamic_component_instances(self):
+		static_root = Block(element="div")
+		static_root.attach_children(Block(element="p", innerHTML="Static text"))
+		static_component = frappe.get_doc(
+			{"doctype": "Builder Component", "block": static_root.as_json()}
+		).insert()
+
+		dynamic_root = Block(element="div")
+		name = Block(element="p", innerHTML="Loading")
+		name.set_dynamic_value("name", "key", "innerHTML", "componentData")
+		dynamic_root.attach_children(
+			name, Block(element="p", innerHTML="Hidden text", visibilityCondition="show_hidden_text")
+		)
+		dynamic_component = frappe.get_doc(
+			{
+				"doctype": "Builder Component",
+				"block": dynamic_root.as_json(),
+				"component_data_script": component_data_script,
+			}
+		).insert()
+
+		body = Block(element="div", originalElement="body")
+		# component trees are parsed per instance, interleave them so freed ids get reused
+		for _ in range(5):
+			body.attach_children(
+				Block(extendedFromComponent=static_component.name),
+				Block(extendedFromComponent=dynamic_component.name),
+			)
+		page = frappe.get_doc(
+			{
+				"doctype": "Builder Page",
+				"page_title": "Static and Dynamic Components Test",
+				"published": 1,
+				"route": "/static-and-dynamic-components-test",
+				"blocks": body.as_json(wrap_in_array=True),
+			}
+		).insert()
+
+		try:
+			content = get_response_content("/static-and-dynamic-components-test")
+			self.assertEqual(content.count("Static text"), 5)
+			self.assertEqual(content.count("John Doe"), 5)
+			self.assertNotIn("Hidden text", content)
+		finally:
+			page.delete()
+			for component in (static_component, dynamic_component):
+				component.delete()
+				frappe.db.delete(
+					"Builder Snapshot",
+					{"reference_doctype": "Builder Component", "reference_name": component.name},
+				)
+
+	def test_cache_by_route_params(self):
+		from unittest.mock import patch
+
+		from builder.builder.doctype.builder_page import builder_page
+		from builder.builder.render_cache import clear_page_output_cache_for_doc
+
+		body = Block(element="div", originalElement="body")
+		heading = Block(element="h1", innerHTML="Product")
+		heading.set_dynamic_value("slug", "key", "innerHTML")
+		body.attach_children(heading)
+		page = frappe.get_doc(
+			{
+				"doctype": "Builder Page",
+				"page_title": "Cache by Route Params Test",
+				"published": 1,
+				"route": "/cache-by-route-params-test/<slug>",
+				"page_data_script": "data.slug = frappe.form_dict.slug",
+				"cache_by_route_params": 1,
+				"clear_cache_on_change_of": "ToDo",
+				"blocks": body.as_json(wrap_in_array=True),
+			}
+		).insert()
+
+		frappe.set_user("Guest")
+		try:
+			with patch.object(
+				builder_page, "execute_script", wraps=builder_page.execute_script
+			) as execute_script:
+				self.assertIn("first", get_response_content("/cache-by-route-params-test/first"))
+				self.assertIn("first", get_response_content("/cache-by-route-params-test/first"))
+				self.assertEqual(execute_script.call_count, 1)
+
+				self.assertIn("second", get_response_content("/cache-by-route-params-test/second"))
+				self.assertEqual(execute_script.call_count, 2)
+
+				clear_page_output_cache_for_doc(frappe._dict(doctype="ToDo"))
+				get_response_content("/cache-by-route-params-test/first")
+				self.assertEqual(execute_script.call_count, 3)
+		finally:
+			frappe.set_user("Administrator")
+			page.delete()
+
+	def test_page_output_cache_doc_events(self):
+		from unittest.mock import patch
+
+		from builder.builder import render_cache
+
+		render_cache.clear_pages_by_source_doctype()
+		render_cache.get_pages_by_source_doctype()
+		with patch.object(frappe, "get_all") as get_all:
+			render_cache.clear_page_output_cache_for_doc(frappe._dict(doctype="ToDo"))
+			get_all.assert_not_called()
+
+			render_cache.clear_pages_by_source_doctype()
+			render_cache.get_pages_by_source_doctype()
+			get_all.assert_called_once()
+
+		with patch.object(frappe.cache, "get_value") as get_value:
+			render_cache.clear_page_output_cache_for_doc(frappe._dict(doctype="Web Page View"))
+			frappe.flags.in_patch = True
+			try:
+				render_cache.clear_page_output_cache_for_doc(frappe._dict(doctype="ToDo"))
+			finally:
+				frappe.flags.in_patch = False
+			get_value.assert_not_called()
+
+		frappe.flags.in_import = True
+		try:
+			with (
+				patch.object(render_cache, "get_pages_by_source_doctype", return_value={"ToDo": ["a-page"]}),
+				patch.object(render_cache, "clear_page_output_cache") as clear_page_output_cache,
+			):
+				render_cache.clear_page_output_cache_for_doc(frappe._dict(doctype="ToDo"))
+			clear_page_output_cache.assert_called_once_with("a-page")
+		finally:
+			frappe.flags.in_import = False
+
+	def test_stale_compiled_page_output_is_not_cached(self):
+		from unittest.mock import patch
+
+		from builder.builder import render_cache
+		from builder.builder.doctype.builder_page import builder_page
+
+		body = Block(element="div", originalElement="body")
+		heading = Block(element="h1", innerHTML="Product")
+		heading.set_dynamic_value("slug", "key", "innerHTML")
+		body.attach_children(heading)
+		page = frappe.get_doc(
+			{
+				"doctype": "Builder Page",
+				"page_title": "Stale Output Cache Test",
+				"published": 1,
+				"route": "/stale-output-cache-test/<slug>",
+				"page_data_script": "data.slug = frappe.form_dict.slug",
+				"cache_by_route_params": 1,
+				"blocks": body.as_json(wrap_in_array=True),
+			}
+		).insert()
+		frappe.db.set_single_value("Builder Settings", "serve_stale_pages", 1)
+
+		frappe.set_user("Guest")
+		try:
+			get_response_content("/stale-output-cache-test/first")
+			render_cache.bump_render_epoch()
+			with (
+				patch.object(
+					builder_page, "execute_script", wraps=builder_page.execute_script
+				) as execute_script,
+				patch.object(frappe, "enqueue") as enqueue,
+			):
+				self.assertIn("first", get_response_content("/stale-output-cache-test/first"))
+				enqueue.assert_called_once()
+				# rendered from the stale compilation, so not kept under the new epoch
+				get_response_content("/stale-output-cache-test/first")
+				self.assertEqual(execute_script.call_count, 2)
+
+				render_cache.rebuild_compiled_page(page.name)
+				get_response_content("/stale-output-cache-test/first")
+				get_response_content("/stale-output-cache-test/first")
+				self.assertEqual(execute_script.call_count, 3)
+		finally:
+			frappe.set_user("Administrator")
+			frappe.db.set_single_value("Builder Settings", "serve_stale_pages", 0)
+			page.delete()
+
+	def test_component_dependency_index(self):
+		from builder.builder.doctype.builder_component_dependency.builder_component_dependency import (
+			get_dependent_pages,
+		)
+		from builder.builder.doctype.builder_settings.builder_settings import get_component_usage_count
+
+		inner = frappe.get_doc(
+			{"doctype": "Builder Component", "block": Block(element="span", innerHTML="Inner").as_json()}
+		).insert()
+		outer_block = Block(element="div")
+		outer_block.attach_children(Block(extendedFromComponent=inner.name))
+		outer = frappe.get_doc({"doctype": "Builder Component", "block": outer_block.as_json()}).insert()
+
+		body = Block(element="div", originalElement="body")
+		body.attach_children(Block(extendedFromComponent=outer.name))
+		page = frappe.get_doc(
+			{
+				"doctype": "Builder Page",
+				"page_title": "Component Dependency Test",
+				"published": 1,
+				"route": "/component-dependency-test",
+				"blocks": body.as_json(wrap_in_array=True),
+			}
+		).insert()
+
+		try:
+			self.assertEqual(get_dependent_pages(outer.name), [page.name])
+			# through the outer component only
+			self.assertEqual(get_dependent_pages(inner.name), [page.name])
+			self.assertEqual(get_dependent_pages(inner.name, nested=False), [])
+			self.assertEqual(get_component_usage_count(outer.name)["count"], 1)
+
+			page.blocks = Block(element="div", originalElement="body").as_json(wrap_in_array=True)
+			page.save()
+			self.assertEqual(get_dependent_pages(outer.name), [])
+		finally:
+			page.delete()
+			self.assertFalse(frappe.db.exists("Builder Component Dependency", {"page": page.name}))
+			for component in (outer, inner):
+				component.delete()
+				frappe.db.delete(
+					"Builder Snapshot",
+					{"reference_doctype": "Builder Component", "reference_name": component.name},
+				)
+
 	@classmethod
 	def tearDownClass(cls):
 		cls.page.delete()
@@ -7,6 +7,10 @@ from frappe.utils import get_files_path
 from frappe.utils.caching import redis_cache
 from frappe.website.utils import clear_cache
 
+from builder.builder.doctype.builder_component_dependency.builder_component_dependency import (
+	get_dependent_pages,
+)
+from builder.builder.render_cache import bump_render_epoch
 from builder.utils import has_page_read, has_page_write
 
 
@@ -30,8 +34,11 @@ class BuilderSettings(Document):
 		restrict_click_handlers: DF.Check
 		script: DF.Code | None
 		script_public_url: DF.ReadOnly | None
+		serve_stale_pages: DF.Check
 		style: DF.Code | None
 		style_public_url: DF.ReadOnly | None
+		use_shared_component_stylesheet: DF.Check
+		use_streaming_html_renderer: DF.Check
 	# end: auto-generated types
 
 	def on_update(self):
@@ -42,6 +49,12 @@ class BuilderSettings(Document):
 		if self.has_value_changed("disable_auto_dark_mode"):
 			# Clear cache for all pages since this is a global setting
 			clear_cache()
+		if self.has_value_changed("use_streaming_html_renderer"):
+			# compiled pages were built with the previous settings
+			bump_render_epoch()
+		if self.has_value_changed("use_shared_component_stylesheet"):
+			# cached pages may link shared stylesheets that are no longer kept
+			clear_cache()
 
 	def handle_script_update(self, attribute, script_type, extension, folder_name):
 		if self.has_value_changed(attribute):
@@ -98,15 +111,7 @@ def replace_component(target_component: str, replace_with: str, filters: str | N
 		frappe.throw(_("The component you are trying to replace with does not exist"))
 
 	# go through all the pages and replace the old component with the new component
-	pages = frappe.get_all(
-		"Builder Page",
-		fields=["name"],
-		filters=frappe.parse_json(filters) if filters else {},
-		or_filters={
-			"blocks": ["like", f"%{target_component}%"],
-			"draft_blocks": ["like", f"%{target_component}%"],
-		},
-	)
+	pages = get_pages_using_component(target_component, filters, fields=["name"])
 	for page in pages:
 		doc = frappe.get_doc("Builder Page", page.name)
 		doc.replace_component(target_component, replace_with)
@@ -117,16 +122,23 @@ def replace_component(target_component: str, replace_with: str, filters: str | N
 def get_component_usage_count(component_id: str, filters: str | None = None):
 	if not frappe.has_permission("Builder Page", ptype="read"):
 		return {"count": 0, "pages": []}
-	pages = frappe.get_all(
-		"Builder Page",
-		filters=frappe.parse_json(filters) if filters else {},
-		fields=["name", "page_title", "route", "preview"],
-		or_filters={
-			"blocks": ["like", f"%{component_id}%"],
-			"draft_blocks": ["like", f"%{component_id}%"],
-		},
+	pages = get_pages_using_component(
+		component_id, filters, fields=["name", "page_title", "route", "preview"]
 	)
 	return {
 		"count": len(pages),
 		"pages": pages,
 	}
+
+
+def get_pages_using_component(component_id: str, filters: str | None, fields: list[str]) -> list[dict]:
+	"""Pages with an instance of the component in their blocks or draft blocks."""
+	page_names = get_dependent_pages(component_id, nested=False)
+	if not page_names:
+		return []
+	filters = frappe.parse_json(filters) if filters else {}
+	if isinstance(filters, dict):
+		filters["name"] = ("in", page_names)
+	else:
+		filters.append(["name", "in", page_names])
+	return frappe.get_all("Builder Page", fields=fields, filters=filters)
@@ -6,6 +6,11 @@ from frappe.model.document import Document
 
 from builder.utils import compact_json
 
+SNAPSHOT_CACHE_KEY = "builder_snapshot"
+# snapshots are write-once, the TTL only bounds memory for rarely used ones
+SNAPSHOT_CACHE_TTL = 7 * 24 * 60 * 60
+SNAPSHOT_CACHE_FIELDS = ["reference_doctype", "reference_name", "snapshot_type", "data"]
+
 
 class BuilderSnapshot(Document):
 	# begin: auto-generated types
@@ -16,13 +21,52 @@ class BuilderSnapshot(Document):
 	if TYPE_CHECKING:
 		from frappe.types import DF
 
+		content_hash: DF.Data | None
 		data: DF.Code
 		label: DF.Data | None
 		reference_doctype: DF.Link
 		reference_name: DF.Data
 		snapshot_type: DF.Data | None
 	# end: auto-generated types
-	pass
+
+	def on_update(self):
+		clear_snapshot_cache(self.name)
+
+	def on_trash(self):
+		clear_snapshot_cache(self.name)
+
+
+def get_cached_snapshot(snapshot_name) -> frappe._dict | None:
+	"""Return the snapshot's reference, type and `data`, cached in Redis.
+
+	Snapshots are never modified after capture, so the cache is only cleared when
+	one is deleted (or, defensively, saved). Bulk deletes that skip `on_trash`
+	must call `clear_snapshot_cache` themselves."""
+	key = f"{SNAPSHOT_CACHE_KEY}:{snapshot_name}"
+	snapshot = frappe.cache.get_value(key, expires=True)
+	if snapshot is None:
+		snapshot = frappe.db.get_value("Builder Snapshot", snapshot_name, SNAPSHOT_CACHE_FIELDS, as_dict=True)
+		if snapshot is None:
+			return None
+		frappe.cache.set_value(key, snapshot, expires_in_sec=SNAPSHOT_CACHE_TTL)
+	return snapshot
+
+
+def clear_snapshot_cache(snapshot_names):
+	if isinstance(snapshot_names, str):
+		snapshot_names = [snapshot_names]
+	if snapshot_names:
+		frappe.cache.delete_value([f"{SNAPSHOT_CACHE_KEY}:{name}" for name in snapshot_names])
+
+
+def get_cached_snapshot_or_throw(snapshot_name) -> frappe._dict:
+	snapshot = get_cached_snapshot(snapshot_name)
+	if snapshot is None:
+		frappe.throw(
+			frappe._("{0} {1} not found").format(frappe._("Builder Snapshot"), snapshot_name),
+			frappe.DoesNotExistError,
+		)
+	return snapshot
 
 
 def take_snapshot(reference_doctype, reference_name, fields, label=None, snapshot_type=None, transform=None):
@@ -56,7 +100,7 @@ def take_snapshot(reference_doctype, reference_name, fields, label=None, snapsho
 
 def get_snapshot_data(snapshot_name) -> dict:
 	"""Return the stored `{fieldname: value}` dict for a snapshot."""
-	snapshot = frappe.get_doc("Builder Snapshot", snapshot_name)
+	snapshot = get_cached_snapshot_or_throw(snapshot_name)
 	return frappe.parse_json(snapshot.data)
 
 
@@ -68,7 +112,7 @@ def get_versioned_doc(snapshot_name):
 	captured fields are overlaid onto a fresh doc (non-captured fields are doctype defaults)
 	so the version stays resolvable.
 	"""
-	snapshot = frappe.get_doc("Builder Snapshot", snapshot_name)
+	snapshot = get_cached_snapshot_or_throw(snapshot_name)
 	try:
 		doc = frappe.get_doc(snapshot.reference_doctype, snapshot.reference_name)
 	except frappe.DoesNotExistError:
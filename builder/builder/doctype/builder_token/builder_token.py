@@ -9,6 +9,8 @@ from frappe.modules.export_file import delete_folder, export_to_files
 from frappe.utils.caching import redis_cache
 from frappe.website.utils import delete_page_cache
 
+from builder.builder.render_cache import bump_render_epoch
+
 
 class BuilderToken(Document):
 	# begin: auto-generated types
@@ -94,3 +96,5 @@ def clear_builder_token_cache(doc=None, method=None):
 	# bust the rendered page cache for tokens.css and its compat alias variables.css
 	delete_page_cache("builder_assets/tokens.css")
 	delete_page_cache("builder_assets/variables.css")
+	# font tokens resolve into the font map of compiled pages
+	bump_render_epoch()
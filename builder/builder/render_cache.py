@@ -0,0 +1,281 @@
+# Copyright (c) 2026, Frappe Technologies Pvt Ltd and contributors
+# For license information, please see license.txt
+
+"""Caches for rendering published Builder Pages.
+
+Compiling a page's blocks into its Jinja template (`get_block_html`) parses the
+blocks, resolves every component and emits the markup and styles. The output
+only depends on the blocks (which carry the pinned component versions) and on
+the live state of unpinned components, so it is stored in Redis as a "compiled
+page" and shared by all workers. The Jinja code compiled from it is kept per
+worker, so a request only pays for the data scripts and the final render.
+
+Anything a compiled page depends on besides its blocks (components, design
+tokens, a full website cache clear) moves the render epoch, which is part of
+every cache key.
+
+Pages with "Cache by Route Parameters" also have their full output cached for
+guests, per route variables and language (see `get_page_output_key`), so their
+data scripts don't run on every request.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+
+import frappe
+from frappe.utils.jinja import get_jenv
+
+import builder
+from builder.utils import compact_json
+
+COMPILED_PAGE_KEY = "builder_compiled_page"
+COMPILED_PAGE_TTL = 24 * 60 * 60
+LATEST_COMPILED_PAGE_KEY = "builder_latest_compiled_page"
+COMPILE_LOCK_KEY = "builder_compile_page_lock"
+COMPILE_LOCK_TTL = 60
+COMPILE_WAIT_TIMEOUT = 5
+RENDER_EPOCH_KEY = "builder_render_epoch"
+PAGE_OUTPUT_KEY = "builder_page_output"
+PAGE_OUTPUT_VERSION_KEY = "builder_page_output_version"
+PAGE_OUTPUT_TTL = 60 * 60
+PAGES_BY_SOURCE_DOCTYPE_VERSION_KEY = "builder_pages_by_cache_source_doctype_version"
+# written on every page view, never worth a page output cache clear
+IGNORED_SOURCE_DOCTYPES = frozenset({"Web Page View", "Builder Page Click"})
+# site -> (version, DocType -> pages whose output depends on it), per worker
+_pages_by_source_doctype: dict[str, tuple[str, dict[str, list[str]]]] = {}
+
+# compiled Jinja code objects per worker, by template source digest
+TEMPLATE_CODE_CACHE_SIZE = 128
+_template_code_cache: OrderedDict = OrderedDict()
+
+
+def get_render_epoch() -> str:
+	return frappe.cache.get_value(RENDER_EPOCH_KEY, generator=lambda: frappe.generate_hash(length=10))
+
+
+def bump_render_epoch():
+	"""Invalidate every compiled page, e.g. after a component or a design token changed."""
+	frappe.cache.set_value(RENDER_EPOCH_KEY, frappe.generate_hash(length=10))
+
+
+def clear_render_cache(path=None):
+	"""`website_clear_cache` hook: a full website cache clear also drops compiled pages,
+	the dynamic route maps and the known non-Builder paths."""
+	from builder.builder.doctype.builder_page.builder_page import bump_route_table_version
+
+	if not path:
+		bump_render_epoch()
+		bump_route_table_version()
+
+
+def get_compiled_page_key(page_name: str, blocks: str) -> str:
+	digest = hashlib.sha256(f"{builder.__version__}:{get_render_epoch()}:{blocks}".encode()).hexdigest()
+	return f"{COMPILED_PAGE_KEY}:{page_name}:{digest}"
+
+
+def get_compiled_page(page_name: str, blocks: str) -> frappe._dict:
+	"""Return the compiled page for `blocks`: its Jinja content, style, font map, whether
+	it has dual mode images, its shared component stylesheets and its deferred component
+	fragments. Compiled once and reused across requests and workers.
+
+	A page is compiled by one worker at a time, the others wait for it. With "Serve
+	Stale Pages While Rebuilding" they, and the worker that got the lock, serve the
+	page's previous compilation of the same blocks (e.g. from before a component
+	changed) while a background job compiles the new one, and flag the request with
+	`frappe.flags.served_stale_builder_page` so its output isn't cached."""
+	key = get_compiled_page_key(page_name, blocks)
+	# skip the request-local memo, callers mutate the font map
+	compiled = frappe.cache.get_value(key, expires=True)
+	if compiled is not None:
+		return compiled
+
+	stale = (
+		get_stale_compiled_page(page_name, blocks)
+		if frappe.get_cached_value("Builder Settings", "Builder Settings", "serve_stale_pages")
+		else None
+	)
+	if acquire_compile_lock(page_name):
+		if stale is not None:
+			# the job releases the lock
+			frappe.enqueue(
+				"builder.builder.render_cache.rebuild_compiled_page", queue="short", page_name=page_name
+			)
+			frappe.flags.served_stale_builder_page = True
+			return stale
+		try:
+			return compile_page(page_name, blocks)
+		finally:
+			release_compile_lock(page_name)
+
+	if stale is not None:
+		frappe.flags.served_stale_builder_page = True
+		return stale
+	return wait_for_compiled_page(key) or compile_page(page_name, blocks)
+
+
+def compile_page(page_name: str, blocks: str) -> frappe._dict:
+	from builder.builder.doctype.builder_page.builder_page import get_block_html
+
+	stylesheets = (
+		[]
+		if frappe.get_cached_value("Builder Settings", "Builder Settings", "use_shared_component_stylesheet")
+		else None
+	)
+	deferred_fragments = {}
+	content, style, fonts, has_dual_mode_image = get_block_html(
+		blocks, component_stylesheets=stylesheets, deferred_fragments=deferred_fragments
+	)
+	compiled = frappe._dict(
+		content=content,
+		style=style,
+		fonts=fonts,
+		has_dual_mode_image=has_dual_mode_image,
+		stylesheets=stylesheets or [],
+		deferred_fragments=deferred_fragments,
+	)
+	key = get_compiled_page_key(page_name, blocks)
+	frappe.cache.set_value(key, compiled, expires_in_sec=COMPILED_PAGE_TTL)
+	frappe.cache.set_value(
+		f"{LATEST_COMPILED_PAGE_KEY}:{page_name}",
+		{"blocks": hashlib.sha256(blocks.encode()).hexdigest(), "key": key},
+		expires_in_sec=COMPILED_PAGE_TTL,
+	)
+	return compiled
+
+
+def get_stale_compiled_page(page_name: str, blocks: str) -> frappe._dict | None:
+	"""The page's last compilation, if it was compiled from the same blocks."""
+	latest = frappe.cache.get_value(f"{LATEST_COMPILED_PAGE_KEY}:{page_name}", expires=True)
+	if not latest or latest["blocks"] != hashlib.sha256(blocks.encode()).hexdigest():
+		return None
+	return frappe.cache.get_value(latest["key"], expires=True)
+
+
+def rebuild_compiled_page(page_name: str):
+	"""Background job: compile the page served stale by `get_compiled_page`."""
+	try:
+		blocks = frappe.db.get_value("Builder Page", page_name, "blocks")
+		if blocks is not None:
+			compile_page(page_name, blocks)
+	finally:
+		release_compile_lock(page_name)
+
+
+def acquire_compile_lock(page_name: str) -> bool:
+	key = frappe.cache.make_key(f"{COMPILE_LOCK_KEY}:{page_name}")
+	return bool(frappe.cache.set(key, 1, nx=True, ex=COMPILE_LOCK_TTL))
+
+
+def release_compile_lock(page_name: str):
+	frappe.cache.delete_value(f"{COMPILE_LOCK_KEY}:{page_name}")
+
+
+def wait_for_compiled_page(key: str) -> frappe._dict | None:
+	"""Wait for another worker to compile a page, None if it takes too long."""
+	deadline = time.monotonic() + COMPILE_WAIT_TIMEOUT
+	while time.monotonic() < deadline:
+		time.sleep(0.1)
+		if (compiled := frappe.cache.get_value(key, expires=True)) is not None:
+			return compiled
+	return None
+
+
+def get_template_code(source: str):
+	"""Compiled Jinja code for `source`, cached per worker.
+
+	Templates themselves can't be reused across requests since they are bound to
+	the request's Jinja environment (and its globals), but the code is not."""
+	digest = hashlib.sha1(source.encode()).hexdigest()
+	code = _template_code_cache.get(digest)
+	if code is None:
+		code = get_jenv().compile(source)
+		_template_code_cache[digest] = code
+		if len(_template_code_cache) > TEMPLATE_CODE_CACHE_SIZE:
+			_template_code_cache.popitem(last=False)
+	else:
+		_template_code_cache.move_to_end(digest)
+	return code
+
+
+def render_compiled_template(source: str, context: dict) -> str:
+	"""Same as `render_template` for a string template, without recompiling it on every request."""
+	from jinja2 import TemplateError
+
+	if not source:
+		return ""
+	if ".__" in source:
+		frappe.throw(frappe._("Illegal template"))
+
+	jenv = get_jenv()
+	try:
+		template = jenv.template_class.from_code(jenv, get_template_code(source), jenv.make_globals(None))
+		return template.render(context)
+	except TemplateError:
+		frappe.throw(
+			title="Jinja Template Error",
+			msg=f"<pre>{source}</pre><pre>{frappe.get_traceback()}</pre>",
+		)
+
+
+def get_page_output_key(page_name: str, route_variables: dict) -> str:
+	version = frappe.cache.get_value(
+		f"{PAGE_OUTPUT_VERSION_KEY}:{page_name}", generator=lambda: frappe.generate_hash(length=10)
+	)
+	digest = hashlib.sha256(
+		f"{builder.__version__}:{get_render_epoch()}:{version}:{frappe.local.lang}:"
+		f"{compact_json(route_variables)}".encode()
+	).hexdigest()
+	return f"{PAGE_OUTPUT_KEY}:{page_name}:{digest}"
+
+
+def clear_page_output_cache(page_name: str):
+	"""Drop the cached output of every route of a page with "Cache by Route Parameters".
+
+	Call it from the doc events of whatever the page's data scripts read, or set
+	the page's "Clear Cache on Change of" to do that for a DocType."""
+	frappe.cache.set_value(f"{PAGE_OUTPUT_VERSION_KEY}:{page_name}", frappe.generate_hash(length=10))
+
+
+def clear_page_output_cache_for_doc(doc, method=None):
+	"""`doc_events` hook: clear the pages whose output depends on the changed document's DocType.
+
+	Data imports clear them too, they are how source records are often updated in bulk."""
+	if (
+		frappe.flags.in_install
+		or frappe.flags.in_migrate
+		or frappe.flags.in_patch
+		or doc.doctype in IGNORED_SOURCE_DOCTYPES
+	):
+		return
+	for page_name in get_pages_by_source_doctype().get(doc.doctype) or []:
+		clear_page_output_cache(page_name)
+
+
+def get_pages_by_source_doctype() -> dict[str, list[str]]:
+	"""Pages with "Cache by Route Parameters" by their "Clear Cache on Change of" DocType.
+
+	Runs on every document save, so it is kept per worker and only rebuilt when
+	`clear_pages_by_source_doctype` moved its version. The version is read once per
+	request (`frappe.cache.get_value` memoizes it), further saves cost nothing."""
+	version = frappe.cache.get_value(
+		PAGES_BY_SOURCE_DOCTYPE_VERSION_KEY, generator=lambda: frappe.generate_hash(length=10)
+	)
+	cached = _pages_by_source_doctype.get(frappe.local.site)
+	if cached and cached[0] == version:
+		return cached[1]
+
+	pages = {}
+	for page in frappe.get_all(
+		"Builder Page",
+		filters={"cache_by_route_params": 1, "clear_cache_on_change_of": ("is", "set")},
+		fields=["name", "clear_cache_on_change_of"],
+	):
+		pages.setdefault(page.clear_cache_on_change_of, []).append(page.name)
+	_pages_by_source_doctype[frappe.local.site] = (version, pages)
+	return pages
+
+
+def clear_pages_by_source_doctype():
+	"""Rebuild every worker's `get_pages_by_source_doctype`, e.g. after a page's cache settings changed."""
+	frappe.cache.set_value(PAGES_BY_SOURCE_DOCTYPE_VERSION_KEY, frappe.generate_hash(length=10))
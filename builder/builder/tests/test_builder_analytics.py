@@ -0,0 +1,364 @@
+import glob
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+import duckdb
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from builder import builder_analytics
+from builder.builder_analytics import (
+	ANALYTICS_VERSION_KEY,
+	ANALYTICS_WRITE_PENDING_KEY,
+	DUCKDB_TABLE,
+	READ_CONNECTION_IDLE_TIMEOUT,
+	VIEW_FIELDS,
+	DuckDBConnection,
+	append_page,
+	close_read_connection,
+	compact_parquet_partitions,
+	create_rollup_tables,
+	get_arrow_page,
+	get_duckdb_type,
+	get_parquet_dir,
+	get_parquet_files,
+	get_parquet_page_key,
+	get_parquet_relation,
+	get_query_source,
+	get_rollup_granularity,
+	get_rollup_table,
+	get_watermark,
+	ingest_to_duckdb,
+	rebuild_parquet_table,
+	set_parquet_watermark,
+	setup_table,
+	write_parquet_batch,
+)
+
+
+class TestBuilderAnalytics(FrappeTestCase):
+	def setUp(self):
+		self.db = duckdb.connect()
+		columns = ", ".join(f"{field} {get_duckdb_type(field)}" for field in VIEW_FIELDS)
+		self.db.execute(f"CREATE TABLE {DUCKDB_TABLE} ({columns})")
+
+	def tearDown(self):
+		self.db.close()
+
+	def append_views(self, rows):
+		append_page(self.db, DUCKDB_TABLE, "Web Page View", get_arrow_page(VIEW_FIELDS, rows))
+
+	def test_rollups_add_up_across_pages(self):
+		create_rollup_tables(self.db, DUCKDB_TABLE, "Web Page View")
+		self.append_views(
+			[
+				["v1", datetime(2025, 1, 1, 10, 5), "1", "/home", "https://www.google.com/search", "", ""],
+				["v2", datetime(2025, 1, 1, 10, 40), "0", "/home", "https://google.com/", "", ""],
+				["v3", datetime(2025, 1, 1, 11, 0), "1", "/about", "", "", ""],
+			]
+		)
+		# same buckets as the first page, the rollup rows are updated rather than duplicated
+		self.append_views(
+			[
+				["v4", datetime(2025, 1, 1, 10, 59), "1", "/home", "https://google.com/", "", ""],
+				["v5", datetime(2025, 1, 1, 18, 0), "0", "/about", None, "", ""],
+			]
+		)
+
+		hourly = self.db.execute(
+			f"""SELECT strftime(bucket, '%H'), path, referrer_domain, hits, unique_hits
+			FROM {get_rollup_table(DUCKDB_TABLE, "hourly")} ORDER BY ALL"""
+		).fetchall()
+		self.assertEqual(
+			hourly,
+			[
+				("10", "/home", "google.com", 3, 2),
+				("11", "/about", "direct", 1, 1),
+				("18", "/about", "direct", 1, 0),
+			],
+		)
+
+		daily = self.db.execute(
+			f"""SELECT path, referrer_domain, hits, unique_hits
+			FROM {get_rollup_table(DUCKDB_TABLE, "daily")} ORDER BY ALL"""
+		).fetchall()
+		self.assertEqual(daily, [("/about", "direct", 2, 1), ("/home", "google.com", 3, 2)])
+
+		# the rollups count every raw row
+		raw_hits = self.db.execute(f"SELECT COUNT(*) FROM {DUCKDB_TABLE}").fetchone()[0]
+		self.assertEqual(sum(row[2] for row in daily), raw_hits)
+
+	def test_get_rollup_granularity(self):
+		test_cases = [
+			(("daily", None, None), "daily"),
+			(("hourly", None, None), "hourly"),
+			(("daily", "2025-01-01", "2025-01-31"), "daily"),
+			(("weekly", "2025-01-01", "2025-01-31"), "daily"),
+			(("hourly", "2025-01-01", "2025-01-31"), "hourly"),
+			(("daily", "2025-01-01 10:00:00", "2025-01-01 17:59:59"), "hourly"),
+			(("daily", "2025-01-01 10:30:00", "2025-01-01 17:59:59"), None),
+			(("daily", "2025-01-01 10:00:00", "2025-01-01 17:30:00"), None),
+		]
+
+		for args, expected in test_cases:
+			self.assertEqual(get_rollup_granularity(*args), expected, args)
+
+	def test_get_query_source(self):
+		# no rollups yet, the raw rows are queried
+		source = get_query_source(self.db, DUCKDB_TABLE, "daily", "2025-01-01", "2025-01-31")
+		self.assertEqual(source.table, DUCKDB_TABLE)
+		self.assertEqual(source.time_column, "creation")
+
+		create_rollup_tables(self.db, DUCKDB_TABLE, "Web Page View")
+		source = get_query_source(self.db, DUCKDB_TABLE, "daily", "2025-01-01", "2025-01-31")
+		self.assertEqual(source.table, get_rollup_table(DUCKDB_TABLE, "daily"))
+		self.assertEqual(source.time_column, "bucket")
+		self.assertEqual(source.count, "SUM(hits)")
+
+		source = get_query_source(self.db, DUCKDB_TABLE, "hourly", "2025-01-01", "2025-01-31")
+		self.assertEqual(source.table, get_rollup_table(DUCKDB_TABLE, "hourly"))
+
+		# sub-hour ranges can't be answered from the rollups
+		source = get_query_source(
+			self.db, DUCKDB_TABLE, "daily", "2025-01-01 10:30:00", "2025-01-01 17:59:59"
+		)
+		self.assertEqual(source.table, DUCKDB_TABLE)
+
+		with patch("builder.builder_analytics.use_parquet_storage", return_value=True):
+			source = get_query_source(self.db, DUCKDB_TABLE, "daily", "2025-01-01", "2025-01-31")
+		self.assertTrue(source.table.endswith(f"AS {DUCKDB_TABLE}"))
+		self.assertEqual(source.time_column, "creation")
+		self.assertEqual(source.count, "COUNT(*)")
+
+
+class TestAnalyticsIngestion(FrappeTestCase):
+	def setUp(self):
+		self.site_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.site_dir, ignore_errors=True)
+		duckdb_path = os.path.join(self.site_dir, "builder_analytics.duckdb")
+		get_duckdb_path = patch.object(builder_analytics, "get_duckdb_path", return_value=duckdb_path)
+		get_duckdb_path.start()
+		self.addCleanup(get_duckdb_path.stop)
+
+		# sorted before any other view, so pages of three split the rows sharing a timestamp
+		timestamps = [datetime(2000, 1, 1, 10, 0)] * 2 + [datetime(2000, 1, 1, 10, 1)] * 4
+		timestamps.append(datetime(2000, 1, 2, 9, 0))
+		for timestamp in timestamps:
+			view = frappe.get_doc(
+				{"doctype": "Web Page View", "path": "/ingestion-test", "is_unique": "1"}
+			).insert(ignore_permissions=True)
+			frappe.db.set_value("Web Page View", view.name, "creation", timestamp, update_modified=False)
+		self.source_rows = frappe.db.count("Web Page View", {"creation": ("is", "set")})
+
+	def get_ingested_counts(self) -> tuple[int, int]:
+		"""Rows in the DuckDB table and the hits counted by its daily rollup."""
+		with duckdb.connect(builder_analytics.get_duckdb_path(), read_only=True) as db:
+			rows = db.execute(f"SELECT COUNT(*) FROM {DUCKDB_TABLE}").fetchone()[0]
+			hits = db.execute(f"SELECT SUM(hits) FROM {get_rollup_table(DUCKDB_TABLE, 'daily')}").fetchone()[
+				0
+			]
+		return rows, hits
+
+	@patch.object(builder_analytics, "INGESTION_PAGE_SIZE", 3)
+	def test_rows_are_ingested_exactly_once(self):
+		ingest_to_duckdb("Web Page View", DUCKDB_TABLE, VIEW_FIELDS)
+		self.assertEqual(self.get_ingested_counts(), (self.source_rows, self.source_rows))
+
+		# nothing new, nothing added
+		ingest_to_duckdb("Web Page View", DUCKDB_TABLE, VIEW_FIELDS)
+		self.assertEqual(self.get_ingested_counts(), (self.source_rows, self.source_rows))
+
+	@patch.object(builder_analytics, "INGESTION_PAGE_SIZE", 3)
+	def test_ingestion_resumes_after_a_kill(self):
+		pages = []
+
+		def kill_on_second_page(*args):
+			pages.append(args)
+			if len(pages) == 2:
+				raise KeyboardInterrupt
+			append_page(*args)
+
+		with patch.object(builder_analytics, "append_page", side_effect=kill_on_second_page):
+			self.assertRaises(KeyboardInterrupt, setup_table, DUCKDB_TABLE, "Web Page View", VIEW_FIELDS)
+		# the first page is in, the second was rolled back with its watermark
+		self.assertEqual(self.get_ingested_counts(), (3, 3))
+
+		ingest_to_duckdb("Web Page View", DUCKDB_TABLE, VIEW_FIELDS)
+		self.assertEqual(self.get_ingested_counts(), (self.source_rows, self.source_rows))
+
+	@patch.object(builder_analytics, "INGESTION_PAGE_SIZE", 3)
+	def test_backfill_resumes_from_its_watermark(self):
+		get_ingestion_page = builder_analytics.get_ingestion_page
+		pages = []
+
+		def time_out_after_two_pages(*args):
+			if len(pages) == 2:
+				raise frappe.QueryTimeoutError
+			pages.append(get_ingestion_page(*args))
+			return pages[-1]
+
+		with patch.object(builder_analytics, "get_ingestion_page", side_effect=time_out_after_two_pages):
+			self.assertRaises(
+				frappe.QueryTimeoutError, setup_table, DUCKDB_TABLE, "Web Page View", VIEW_FIELDS
+			)
+		with duckdb.connect(builder_analytics.get_duckdb_path(), read_only=True) as db:
+			last_creation, last_name, rows_ingested = get_watermark(db, DUCKDB_TABLE)
+		# both pages are in, and the next run starts after the last row of the second
+		self.assertEqual((last_name, rows_ingested), (pages[1][-1][0], 6))
+
+		with patch.object(builder_analytics, "get_ingestion_page", wraps=get_ingestion_page) as resumed:
+			ingest_to_duckdb("Web Page View", DUCKDB_TABLE, VIEW_FIELDS)
+		self.assertEqual(resumed.call_args_list[0].args[2:], (last_creation, last_name))
+		self.assertEqual(self.get_ingested_counts(), (self.source_rows, self.source_rows))
+
+
+class TestParquetStorage(FrappeTestCase):
+	def setUp(self):
+		self.site_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.site_dir, ignore_errors=True)
+		get_parquet_dir = patch.object(
+			builder_analytics, "get_parquet_dir", side_effect=lambda table: os.path.join(self.site_dir, table)
+		)
+		get_parquet_dir.start()
+		self.addCleanup(get_parquet_dir.stop)
+
+	def get_views(self, day: datetime, count: int, prefix: str = "v") -> list[list]:
+		return [
+			[f"{prefix}{i}", day.replace(hour=10, minute=i), "1", "/home", "", "", ""] for i in range(count)
+		]
+
+	def count_rows(self, from_date: str | None = None, to_date: str | None = None) -> int:
+		with duckdb.connect() as db:
+			return db.execute(
+				f"SELECT COUNT(*) FROM {get_parquet_relation(DUCKDB_TABLE, from_date, to_date)}"
+			).fetchone()[0]
+
+	def test_retried_page_replaces_its_files(self):
+		table_dir = get_parquet_dir(DUCKDB_TABLE)
+		rows = self.get_views(datetime(2025, 1, 1), 3) + self.get_views(datetime(2025, 1, 2), 2)
+		write_parquet_batch(DUCKDB_TABLE, get_arrow_page(VIEW_FIELDS, rows), "page_a")
+		write_parquet_batch(DUCKDB_TABLE, get_arrow_page(VIEW_FIELDS, rows), "page_a")
+		self.assertEqual(self.count_rows(), 5)
+		self.assertEqual(len(get_parquet_files(table_dir, "2025-01-01")), 1)
+		# partitions outside the date range are not read
+		self.assertEqual(self.count_rows("2025-01-02", "2025-01-02"), 2)
+
+		write_parquet_batch(DUCKDB_TABLE, get_arrow_page(VIEW_FIELDS, rows), "page_b")
+		self.assertEqual(self.count_rows(), 10)
+		self.assertFalse(os.listdir(os.path.join(table_dir, builder_analytics.PARQUET_STAGING_DIR)))
+
+	def test_compaction_skips_the_pending_page_and_expires_old_days(self):
+		table_dir = get_parquet_dir(DUCKDB_TABLE)
+		yesterday = frappe.utils.get_datetime(frappe.utils.add_days(frappe.utils.getdate(), -1))
+		for page_key in ("page_a", "page_b"):
+			rows = self.get_views(yesterday, 3, prefix=page_key)
+			write_parquet_batch(DUCKDB_TABLE, get_arrow_page(VIEW_FIELDS, rows), page_key)
+		write_parquet_batch(
+			DUCKDB_TABLE, get_arrow_page(VIEW_FIELDS, self.get_views(datetime(2000, 1, 1), 2)), "page_a"
+		)
+		# the job died after writing the page that starts at the watermark
+		last_creation, last_name = yesterday.replace(hour=10, minute=2), "page_b2"
+		pending_page_key = get_parquet_page_key(last_creation, last_name)
+		rows = self.get_views(yesterday.replace(hour=11), 2, prefix="pending")
+		write_parquet_batch(DUCKDB_TABLE, get_arrow_page(VIEW_FIELDS, rows), pending_page_key)
+		set_parquet_watermark(DUCKDB_TABLE, last_creation, last_name)
+
+		compact_parquet_partitions(DUCKDB_TABLE, retention_days=30)
+		files = [os.path.basename(file) for file in get_parquet_files(table_dir, str(yesterday.date()))]
+		self.assertEqual(len(files), 2)
+		self.assertEqual(len([file for file in files if file.startswith(pending_page_key)]), 1)
+		self.assertEqual(self.count_rows(), 8)
+		self.assertFalse(os.path.exists(os.path.join(table_dir, "day=2000-01-01")))
+
+	def test_rebuild_swaps_in_a_new_version(self):
+		table_dir = get_parquet_dir(DUCKDB_TABLE)
+		write_parquet_batch(
+			DUCKDB_TABLE, get_arrow_page(VIEW_FIELDS, self.get_views(datetime(2025, 1, 1), 4)), "page_a"
+		)
+
+		versions = []
+		for count in (3, 2, 1):
+			rows = self.get_views(datetime(2025, 1, 1), count)
+			with patch.object(builder_analytics, "get_ingestion_page", side_effect=[rows, []]):
+				rebuild_parquet_table("Web Page View", DUCKDB_TABLE, VIEW_FIELDS)
+			self.assertTrue(os.path.islink(table_dir))
+			self.assertEqual(self.count_rows(), count)
+			versions.append(os.path.realpath(table_dir))
+
+		# the previous version is kept for readers that listed it before the swap
+		kept = glob.glob(f"{table_dir}{builder_analytics.PARQUET_VERSION_SEPARATOR}*")
+		self.assertEqual(sorted(kept), sorted(versions[-2:]))
+
+
+class TestReadConnectionPool(FrappeTestCase):
+	def setUp(self):
+		self.site_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.site_dir, ignore_errors=True)
+		self.duckdb_path = os.path.join(self.site_dir, "builder_analytics.duckdb")
+		get_duckdb_path = patch.object(builder_analytics, "get_duckdb_path", return_value=self.duckdb_path)
+		get_duckdb_path.start()
+		self.addCleanup(get_duckdb_path.stop)
+		self.addCleanup(close_read_connection, self.duckdb_path)
+
+		with DuckDBConnection() as db:
+			db.execute("CREATE TABLE numbers AS SELECT 1 AS n")
+
+	def read(self) -> frappe._dict | None:
+		with DuckDBConnection(read_only=True) as db:
+			self.assertEqual(db.execute("SELECT n FROM numbers").fetchone(), (1,))
+		return builder_analytics._read_connections.get(self.duckdb_path)
+
+	def test_connection_is_reused_until_a_write(self):
+		pooled = self.read()
+		self.assertIsNotNone(pooled)
+		self.assertIs(self.read(), pooled)
+
+		# another process wrote to the database
+		frappe.cache.incr(frappe.cache.make_key(ANALYTICS_VERSION_KEY))
+		reopened = self.read()
+		self.assertIsNot(reopened, pooled)
+		self.assertIs(self.read(), reopened)
+
+	def test_pending_write_closes_the_connection(self):
+		self.read()
+		frappe.cache.set_value(ANALYTICS_WRITE_PENDING_KEY, 1)
+		try:
+			# read through a short-lived connection, so the writer can take the lock
+			self.assertIsNone(self.read())
+			with duckdb.connect(self.duckdb_path) as db:
+				db.execute("SELECT 1")
+		finally:
+			frappe.cache.delete_value(ANALYTICS_WRITE_PENDING_KEY)
+		self.assertIsNotNone(self.read())
+
+	def test_pending_write_retires_a_connection_in_use(self):
+		with DuckDBConnection(read_only=True):
+			pooled = builder_analytics._read_connections.get(self.duckdb_path)
+			frappe.cache.set_value(ANALYTICS_WRITE_PENDING_KEY, 1)
+			try:
+				# not handed out to new readers while the write is pending
+				self.assertIsNone(self.read())
+				self.assertTrue(pooled.retired)
+			finally:
+				frappe.cache.delete_value(ANALYTICS_WRITE_PENDING_KEY)
+		# closed once its last reader is done
+		self.assertRaises(duckdb.ConnectionException, pooled.connection.execute, "SELECT 1")
+		self.assertIsNot(self.read(), pooled)
+
+	def test_idle_connection_closes_a_timeout_after_its_last_use(self):
+		with patch.object(builder_analytics.threading, "Timer") as timer:
+			pooled = self.read()
+			close_if_idle = timer.call_args.args[1]
+
+			pooled.last_used = time.monotonic() - 4
+			close_if_idle()
+			self.assertAlmostEqual(timer.call_args.args[0], READ_CONNECTION_IDLE_TIMEOUT - 4, delta=1)
+			self.assertIs(builder_analytics._read_connections.get(self.duckdb_path), pooled)
+
+			pooled.last_used = time.monotonic() - READ_CONNECTION_IDLE_TIMEOUT
+			timer.call_args.args[1]()
+			self.assertIsNone(builder_analytics._read_connections.get(self.duckdb_path))
@@ -9,6 +9,7 @@ from builder.utils import (
 	ColonRule,
 	camel_case_to_kebab_case,
 	clean_data,
+	compile_restricted_script,
 	copy_asset_file,
 	copy_assets_from_blocks,
 	copy_img_to_asset_folder,
@@ -16,12 +17,15 @@ from builder.utils import (
 	execute_script,
 	extract_components_from_blocks,
 	get_builder_page_preview_file_paths,
+	get_safer_globals,
 	get_template_assets_folder_path,
 	is_component_used,
 	make_safe_get_request,
 	normalize_legacy_raw_styles,
 	process_block_assets,
 	remove_unsafe_fields,
+	safe_get_all,
+	safe_get_all_many,
 	sanitize_style_value,
 	split_styles,
 )
@@ -139,6 +143,47 @@ class TestBuilderUtils(FrappeTestCase):
 		execute_script("data.sum = a + b", {"data": data, "a": 2, "b": 2}, "test.py")
 		self.assertEqual(data.sum, 4)
 
+	def test_get_all_many(self):
+		spec = {"doctype": "User", "filters": {"name": "Administrator"}, "fields": ["name"]}
+		frappe.local.builder_render_memo = {}
+		try:
+			with patch("builder.utils.safe_get_all", wraps=safe_get_all) as get_all:
+				first = safe_get_all_many({"admins": spec, "roles": {"doctype": "Role", "limit": 1}})
+				# e.g. another component instance in the same render
+				second = safe_get_all_many([spec])
+			self.assertEqual(first["admins"], [{"name": "Administrator"}])
+			self.assertEqual(len(first["roles"]), 1)
+			self.assertEqual(second, [first["admins"]])
+			self.assertEqual(get_all.call_count, 2)
+
+			first["admins"][0]["name"] = "changed"
+			self.assertEqual(safe_get_all_many([spec]), [[{"name": "Administrator"}]])
+		finally:
+			frappe.local.builder_render_memo = None
+
+	def test_safer_globals_do_not_leak_between_scripts(self):
+		first = get_safer_globals()
+		first.frappe.db.get_all = None
+		first.json.loads = None
+		first.len = None
+
+		second = get_safer_globals()
+		self.assertIs(second.frappe.db.get_all, safe_get_all)
+		self.assertIsNotNone(second.json.loads)
+		self.assertIs(second.len, len)
+		self.assertEqual(second.frappe.session.user, frappe.session.user)
+		self.assertEqual(second.frappe.db.count("User", {"name": "Administrator"}), 1)
+
+	@patch("builder.utils.is_safe_exec_enabled", return_value=False)
+	def test_execute_script_reuses_compiled_code(self, *args):
+		compile_restricted_script.cache_clear()
+		for i in range(3):
+			data = frappe._dict({})
+			execute_script("data.value = n * 2", {"data": data, "n": i}, "test.py")
+			self.assertEqual(data.value, i * 2)
+		info = compile_restricted_script.cache_info()
+		self.assertEqual((info.misses, info.hits), (1, 2))
+
 	@patch("builder.utils.is_safe_exec_enabled", return_value=False)
 	@patch("frappe.utils.safe_exec.is_safe_exec_enabled", return_value=False)
 	def test_execute_script_with_enabled_server_script(self, *args):
@@ -1,31 +1,102 @@
+import glob
+import hashlib
 import os
+import shutil
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import duckdb
 import frappe
-import pandas as pd
+import pyarrow as pa
 
 DUCKDB_TABLE = "web_page_views"
 CLICKS_TABLE = "web_page_clicks"
 
+# With `"builder_analytics_storage": "parquet"` in the site config, ingested rows are
+# written as Parquet files partitioned by day (<site>/builder_analytics/<table>/day=YYYY-MM-DD/)
+# instead of into builder_analytics.duckdb. Readers query them from an in-memory DuckDB
+# connection, so ingestion never locks them out, and only open the files of the days
+# they ask for. Old partitions are compacted (and expired after
+# `builder_analytics_retention_days`, if set) daily. Ingestion, rebuilds and compaction
+# of a table hold PARQUET_LOCK_KEY, so overlapping runs never write the same files.
+# A rebuild writes a new version of the table's directory and points the table's
+# symlink at it (see rebuild_parquet_table).
+PARQUET_STORAGE_DIR = "builder_analytics"
+PARQUET_STAGING_DIR = ".staging"
+PARQUET_WATERMARK_FILE = "watermark.json"
+PARQUET_REBUILD_SUFFIX = ".rebuild"
+PARQUET_VERSION_SEPARATOR = ".v"
+PARQUET_LOCK_KEY = "builder_analytics_parquet_lock"
+PARQUET_LOCK_TTL = 60 * 60
+
+
+def use_parquet_storage() -> bool:
+	return frappe.conf.get("builder_analytics_storage") == "parquet"
+
+
+# Read-only connections are kept open per worker process (see get_read_connection), so
+# dashboard requests don't reload the catalog and lose DuckDB's buffer cache every time.
+# A writer raises ANALYTICS_WRITE_PENDING_KEY while it waits for the (exclusive) file
+# lock: workers stop handing out their pooled connection and close it once the reads on it
+# are done, and idle ones close after READ_CONNECTION_IDLE_TIMEOUT anyway. Every write bumps ANALYTICS_VERSION_KEY,
+# and a pooled connection opened before it is reopened.
+ANALYTICS_VERSION_KEY = "builder_analytics_version"
+ANALYTICS_WRITE_PENDING_KEY = "builder_analytics_write_pending"
+READ_CONNECTION_IDLE_TIMEOUT = 10
+
+_read_connections: dict[str, frappe._dict] = {}
+_read_connections_lock = threading.Lock()
+
 
 class DuckDBConnection:
 	# DuckDB takes a single cross-process file lock: concurrent read-only connections
 	# coexist, but a read-write one is exclusive. Reads pass read_only=True so dashboard
 	# requests don't lock each other out; both kinds retry briefly to ride out the lock
-	# held by the periodic ingestion (or another worker mid-connect).
-	def __init__(self, read_only=False, retries=8, retry_delay=0.25):
+	# held by the periodic ingestion (or another worker mid-connect). Writers retry for
+	# longer, until the pooled read connections of other workers are closed.
+	# With Parquet storage, reads get an in-memory connection and take no lock at all.
+	def __init__(self, read_only=False, retries=None, retry_delay=0.25):
 		self.db = None
+		self.pooled = None
+		self.signals_write = False
 		self.read_only = read_only
-		self.retries = retries
+		self.retries = retries or (8 if read_only else int(READ_CONNECTION_IDLE_TIMEOUT / retry_delay) + 8)
 		self.retry_delay = retry_delay
 
 	def __enter__(self):
-		duckdb_path = os.path.join(frappe.get_site_path(), "builder_analytics.duckdb")
+		if self.read_only and use_parquet_storage():
+			self.db = duckdb.connect()
+			return self.db
+
+		duckdb_path = get_duckdb_path()
+		if self.read_only:
+			self.pooled = get_read_connection(duckdb_path, self.connect)
+			if self.pooled:
+				self.db = self.pooled.connection.cursor()
+				return self.db
+		elif not frappe.flags.in_duckdb_write:
+			# the outermost writer of nested ones (e.g. ingestion rebuilding a table) signals
+			self.signals_write = frappe.flags.in_duckdb_write = True
+			frappe.cache.set_value(ANALYTICS_WRITE_PENDING_KEY, 1, expires_in_sec=60)
+
+		try:
+			if self.signals_write:
+				# a pooled read-only connection of this process would conflict with it
+				close_read_connection(duckdb_path)
+			self.db = self.connect(duckdb_path)
+		except Exception:
+			# __exit__ doesn't run when __enter__ fails, stop signalling a write that never comes
+			if self.signals_write:
+				frappe.flags.in_duckdb_write = False
+				frappe.cache.delete_value(ANALYTICS_WRITE_PENDING_KEY)
+			raise
+		return self.db
+
+	def connect(self, duckdb_path: str):
 		for attempt in range(self.retries):
 			try:
-				self.db = duckdb.connect(duckdb_path, read_only=self.read_only)
-				return self.db
+				return duckdb.connect(duckdb_path, read_only=self.read_only)
 			except duckdb.IOException as e:
 				# Only the lock conflict is transient; a missing file etc. should surface
 				if "lock" not in str(e).lower() or attempt == self.retries - 1:
@@ -35,12 +106,127 @@ class DuckDBConnection:
 	def __exit__(self, exc_type, exc_val, exc_tb):
 		if self.db:
 			self.db.close()
+		if self.pooled:
+			release_read_connection(self.pooled)
+		elif self.signals_write:
+			frappe.flags.in_duckdb_write = False
+			frappe.cache.delete_value(ANALYTICS_WRITE_PENDING_KEY)
+			frappe.cache.incr(frappe.cache.make_key(ANALYTICS_VERSION_KEY))
+
+
+def get_duckdb_path() -> str:
+	return os.path.join(frappe.get_site_path(), "builder_analytics.duckdb")
+
+
+def get_read_connection(duckdb_path: str, connect) -> frappe._dict | None:
+	"""This process's read-only connection to `duckdb_path`, opened with `connect` if needed.
+	None while a writer is waiting for the lock."""
+	version = frappe.utils.cint(frappe.cache.get(frappe.cache.make_key(ANALYTICS_VERSION_KEY)))
+	write_pending = frappe.cache.get_value(ANALYTICS_WRITE_PENDING_KEY)
+
+	with _read_connections_lock:
+		pooled = _read_connections.get(duckdb_path)
+		if pooled and (write_pending or pooled.version != version):
+			# even if it is in use: under steady traffic it would never be released for the writer
+			retire_read_connection(pooled)
+			pooled = None
+		if pooled:
+			return use_read_connection(pooled)
+	if write_pending:
+		return None
+
+	# connecting can wait out another process's write lock, without holding up this
+	# process's threads that only need to check out or release their connection
+	connection = connect(duckdb_path)
+	with _read_connections_lock:
+		if pooled := _read_connections.get(duckdb_path):
+			# another thread connected in the meantime
+			connection.close()
+		else:
+			pooled = _read_connections[duckdb_path] = frappe._dict(
+				path=duckdb_path, connection=connection, version=version, in_use=0, retired=False
+			)
+			schedule_idle_check(pooled)
+		return use_read_connection(pooled)
 
 
-def get_date_filter(from_date: str | None = None, to_date: str | None = None) -> tuple[str, list]:
-	"""Return a parameterized date filter clause and its bind values."""
+def use_read_connection(pooled: frappe._dict) -> frappe._dict:
+	# with _read_connections_lock held
+	pooled.in_use += 1
+	pooled.last_used = time.monotonic()
+	return pooled
+
+
+def release_read_connection(pooled: frappe._dict):
+	with _read_connections_lock:
+		pooled.in_use -= 1
+		pooled.last_used = time.monotonic()
+		if pooled.retired and not pooled.in_use:
+			close_pooled_connection(pooled)
+
+
+def close_read_connection(duckdb_path: str):
+	with _read_connections_lock:
+		if pooled := _read_connections.get(duckdb_path):
+			retire_read_connection(pooled)
+
+
+def retire_read_connection(pooled: frappe._dict):
+	"""Stop handing out a pooled connection and close it once its last reader is done."""
+	# with _read_connections_lock held
+	if pooled.in_use:
+		if _read_connections.get(pooled.path) is pooled:
+			del _read_connections[pooled.path]
+		pooled.retired = True
+	else:
+		close_pooled_connection(pooled)
+
+
+def close_pooled_connection(pooled: frappe._dict):
+	# with _read_connections_lock held
+	if _read_connections.get(pooled.path) is pooled:
+		del _read_connections[pooled.path]
+	pooled.timer.cancel()
+	pooled.connection.close()
+
+
+def schedule_idle_check(pooled: frappe._dict, delay: float | None = None):
+	def close_if_idle():
+		with _read_connections_lock:
+			if _read_connections.get(pooled.path) is not pooled:
+				return
+			idle_for = time.monotonic() - pooled.last_used
+			if pooled.in_use:
+				schedule_idle_check(pooled)
+			elif idle_for >= READ_CONNECTION_IDLE_TIMEOUT:
+				close_pooled_connection(pooled)
+			else:
+				# READ_CONNECTION_IDLE_TIMEOUT after its last use, writers only wait that long
+				schedule_idle_check(pooled, READ_CONNECTION_IDLE_TIMEOUT - idle_for)
+
+	pooled.timer = threading.Timer(delay or READ_CONNECTION_IDLE_TIMEOUT, close_if_idle)
+	pooled.timer.daemon = True
+	pooled.timer.start()
+
+
+def run_queries(db, queries: list[tuple[str, list]]) -> list[list[tuple]]:
+	"""Run (query, params) pairs concurrently, each on its own cursor of `db`, and
+	return their rows in order. DuckDB releases the GIL while it executes them."""
+
+	def run(query: tuple[str, list]) -> list[tuple]:
+		with db.cursor() as cursor:
+			return cursor.execute(*query).fetchall()
+
+	if len(queries) < 2:
+		return [run(query) for query in queries]
+	with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+		return list(executor.map(run, queries))
+
+
+def get_date_range(from_date: str | None = None, to_date: str | None = None) -> tuple[str, str] | None:
+	"""Return the date range with the time component filled in, if both ends are given."""
 	if not from_date or not to_date:
-		return "", []
+		return None
 
 	# Add time component if not present
 	if len(from_date) == 10:  # YYYY-MM-DD format
@@ -48,7 +234,21 @@ def get_date_filter(from_date: str | None = None, to_date: str | None = None) ->
 	if len(to_date) == 10:  # YYYY-MM-DD format
 		to_date += " 23:59:59"
 
-	return "creation >= CAST(? AS TIMESTAMP) AND creation <= CAST(? AS TIMESTAMP)", [from_date, to_date]
+	return from_date, to_date
+
+
+def get_date_filter(
+	from_date: str | None = None, to_date: str | None = None, time_column: str = "creation"
+) -> tuple[str, list]:
+	"""Return a parameterized date filter clause and its bind values."""
+	date_range = get_date_range(from_date, to_date)
+	if not date_range:
+		return "", []
+
+	return (
+		f"{time_column} >= CAST(? AS TIMESTAMP) AND {time_column} <= CAST(? AS TIMESTAMP)",
+		list(date_range),
+	)
 
 
 def get_empty_analytics():
@@ -75,12 +275,13 @@ def build_where_clause(
 	from_date: str | None = None,
 	to_date: str | None = None,
 	route_filter_type: str = "wildcard",
+	time_column: str = "creation",
 ) -> tuple[str, list]:
 	"""Combine the date and route filters into a single WHERE clause and ordered params."""
 	conditions = []
 	params: list = []
 
-	date_clause, date_params = get_date_filter(from_date, to_date)
+	date_clause, date_params = get_date_filter(from_date, to_date, time_column)
 	if date_clause:
 		conditions.append(date_clause)
 		params += date_params
@@ -108,32 +309,360 @@ def duckdb_column_cast(field: str) -> str:
 	return f"CAST({field} AS VARCHAR) as {field}"
 
 
-def duckdb_insert_placeholder(field: str) -> str:
-	"""DuckDB VALUES() placeholder matching duckdb_column_cast for incremental inserts."""
-	if field == "creation":
-		return "TRY_CAST(? AS TIMESTAMP)"
-	if field == "is_unique":
-		return "CAST(COALESCE(NULLIF(CAST(? AS VARCHAR), ''), '0') AS INTEGER)"
-	return "?"
+REFERRER_DOMAIN_SQL = """
+	CASE
+		WHEN referrer IS NULL OR referrer = '' THEN 'direct'
+		WHEN REGEXP_MATCHES(referrer, '^https?://([^/]+)') THEN
+			REGEXP_REPLACE(REGEXP_EXTRACT(referrer, '^https?://([^/]+)', 1), '^www\\.', '')
+		ELSE 'direct'
+	END
+"""
+
+# Rollups are pre-aggregated copies of a table: hits and unique hits per path, time
+# bucket and these dimensions. Dashboard queries read the coarsest rollup that covers
+# their interval and date range instead of scanning (and parsing) every raw row.
+ROLLUP_DIMENSIONS = {
+	"Web Page View": {"referrer_domain": REFERRER_DOMAIN_SQL},
+	"Builder Page Click": {"element": "COALESCE(element, '')", "text": "COALESCE(text, '')"},
+}
+ROLLUP_GRANULARITIES = {"hourly": "hour", "daily": "day"}
+
+
+def get_rollup_table(table_name: str, granularity: str) -> str:
+	return f"{table_name}_{granularity}"
+
+
+def table_exists(db, table_name: str) -> bool:
+	result = db.execute(
+		"SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [table_name]
+	).fetchone()
+	return bool(result and result[0])
+
+
+def setup_rollups(db, table_name: str, doctype: str):
+	"""(Re)build the rollups of a DuckDB table from all of its rows."""
+	create_rollup_tables(db, table_name, doctype)
+	update_rollups(db, table_name, doctype)
+
+
+def create_rollup_tables(db, table_name: str, doctype: str):
+	dimensions = ROLLUP_DIMENSIONS[doctype]
+	key = ", ".join(["bucket", "path", *dimensions])
+	columns = ", ".join(f"{dimension} VARCHAR NOT NULL" for dimension in dimensions)
+	for granularity in ROLLUP_GRANULARITIES:
+		db.execute(
+			f"""
+			CREATE OR REPLACE TABLE {get_rollup_table(table_name, granularity)} (
+				bucket TIMESTAMP NOT NULL,
+				path VARCHAR NOT NULL,
+				{columns},
+				hits BIGINT NOT NULL,
+				unique_hits BIGINT NOT NULL,
+				PRIMARY KEY ({key})
+			)
+			"""
+		)
+
+
+def update_rollups(db, table_name: str, doctype: str, source: str | None = None):
+	"""Add the rows of `source` (a relation shaped like the table, the whole table if not set)
+	to the rollups of a DuckDB table."""
+	dimensions = ROLLUP_DIMENSIONS[doctype]
+	key = ", ".join(["bucket", "path", *dimensions])
+	select_dimensions = ", ".join(
+		f"{expression} AS {dimension}" for dimension, expression in dimensions.items()
+	)
+
+	for granularity, unit in ROLLUP_GRANULARITIES.items():
+		db.execute(
+			f"""
+			INSERT INTO {get_rollup_table(table_name, granularity)}
+			SELECT
+				date_trunc('{unit}', creation) AS bucket,
+				COALESCE(path, '') AS path,
+				{select_dimensions},
+				COUNT(*) AS hits,
+				SUM(is_unique) AS unique_hits
+			FROM {source or table_name}
+			WHERE creation IS NOT NULL
+			GROUP BY ALL
+			ON CONFLICT ({key}) DO UPDATE SET
+				hits = hits + EXCLUDED.hits,
+				unique_hits = unique_hits + EXCLUDED.unique_hits
+			"""
+		)
+
+
+def get_parquet_dir(table_name: str) -> str:
+	return os.path.join(frappe.get_site_path(), PARQUET_STORAGE_DIR, table_name)
+
+
+def get_parquet_partitions(
+	table_dir: str, from_day: str | None = None, to_day: str | None = None
+) -> list[str]:
+	"""Days (YYYY-MM-DD) with a partition, oldest first, optionally within [from_day, to_day]."""
+	if not os.path.isdir(table_dir):
+		return []
+	days = sorted(name[4:] for name in os.listdir(table_dir) if name.startswith("day="))
+	return [day for day in days if (not from_day or day >= from_day) and (not to_day or day <= to_day)]
+
+
+def get_parquet_files(table_dir: str, day: str) -> list[str]:
+	return sorted(glob.glob(os.path.join(table_dir, f"day={day}", "*.parquet")))
+
+
+def to_sql_string(value: str) -> str:
+	return "'{}'".format(value.replace("'", "''"))
+
+
+def get_duckdb_type(field: str) -> str:
+	"""Column type of a source field in DuckDB, as cast by duckdb_column_cast."""
+	return {"creation": "TIMESTAMP", "is_unique": "INTEGER"}.get(field, "VARCHAR")
+
+
+def get_parquet_relation(table_name: str, from_date: str | None = None, to_date: str | None = None) -> str:
+	"""SQL relation over the Parquet files of `table_name`, pruned to the partitions of the date range."""
+	date_range = get_date_range(from_date, to_date)
+	from_day, to_day = (date_range[0][:10], date_range[1][:10]) if date_range else (None, None)
+	# list the files of one version of the table, even if a rebuild swaps it meanwhile
+	table_dir = os.path.realpath(get_parquet_dir(table_name))
+	files = [
+		file
+		for day in get_parquet_partitions(table_dir, from_day, to_day)
+		for file in get_parquet_files(table_dir, day)
+	]
+	if files:
+		return f"read_parquet([{', '.join(to_sql_string(file) for file in files)}]) AS {table_name}"
+
+	# nothing ingested for these days, an empty relation with the same columns
+	fields = CLICK_FIELDS if table_name == CLICKS_TABLE else VIEW_FIELDS
+	columns = ", ".join(f"NULL::{get_duckdb_type(field)} AS {field}" for field in fields)
+	return f"(SELECT {columns} WHERE false) AS {table_name}"
+
+
+def get_parquet_page_key(last_creation=None, last_name: str | None = None) -> str:
+	"""Name of the files of the ingestion page that starts after (last_creation, last_name)."""
+	return "page_" + hashlib.sha1(f"{last_creation}|{last_name}".encode()).hexdigest()[:16]
+
+
+def write_parquet_batch(table_name: str, page: pa.Table, page_key: str):
+	"""Write rows into their day partitions, as files named after `page_key`.
+
+	The files are written to a staging directory first and then renamed into the
+	partitions, so readers never see a partly written file. Rows without a valid
+	creation have no partition and are skipped."""
+	table_dir = get_parquet_dir(table_name)
+	staging_dir = os.path.join(table_dir, PARQUET_STAGING_DIR, frappe.generate_hash())
+	os.makedirs(os.path.dirname(staging_dir), exist_ok=True)
+
+	select_cols = ", ".join(duckdb_column_cast(field) for field in page.column_names)
+	try:
+		with duckdb.connect() as db:
+			db.register("ingestion_page", page)
+			db.execute(
+				f"""
+				COPY (
+					SELECT *, strftime(creation, '%Y-%m-%d') AS day
+					FROM (SELECT {select_cols} FROM ingestion_page)
+					WHERE creation IS NOT NULL
+				) TO {to_sql_string(staging_dir)} (FORMAT parquet, PARTITION_BY (day), FILENAME_PATTERN '{page_key}_')
+				"""
+			)
+
+		partitions = os.listdir(staging_dir) if os.path.isdir(staging_dir) else []
+		for partition in partitions:
+			os.makedirs(os.path.join(table_dir, partition), exist_ok=True)
+			for file in os.listdir(os.path.join(staging_dir, partition)):
+				# replaces the files of an earlier attempt at the same page
+				os.rename(
+					os.path.join(staging_dir, partition, file), os.path.join(table_dir, partition, file)
+				)
+	finally:
+		shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def get_parquet_watermark(table_name: str) -> tuple:
+	"""(creation, name) of the last row ingested into the Parquet files of `table_name`."""
+	watermark_file = os.path.join(get_parquet_dir(table_name), PARQUET_WATERMARK_FILE)
+	if not os.path.exists(watermark_file):
+		return None, None
+	with open(watermark_file) as f:
+		watermark = frappe.parse_json(f.read())
+	return frappe.utils.get_datetime(watermark.creation), watermark.name
+
+
+def set_parquet_watermark(table_name: str, last_creation, last_name: str):
+	watermark_file = os.path.join(get_parquet_dir(table_name), PARQUET_WATERMARK_FILE)
+	with open(f"{watermark_file}.tmp", "w") as f:
+		f.write(frappe.as_json({"creation": str(last_creation), "name": last_name}))
+	os.replace(f"{watermark_file}.tmp", watermark_file)
+
+
+def ingest_to_parquet(doctype: str, table_name: str, fields: list[str]):
+	"""Append new `doctype` rows to the Parquet partitions of `table_name`.
+
+	The files of a page are named after where it starts, so if the job dies
+	before the watermark moves past it, the retry replaces them rather than
+	adding the same rows again."""
+	last_creation, last_name = get_parquet_watermark(table_name)
+	while True:
+		rows = get_ingestion_page(doctype, fields, last_creation, last_name)
+		if not rows:
+			break
+
+		write_parquet_batch(
+			table_name, get_arrow_page(fields, rows), get_parquet_page_key(last_creation, last_name)
+		)
+		last_name, last_creation = rows[-1][0], rows[-1][fields.index("creation") + 1]
+		set_parquet_watermark(table_name, last_creation, last_name)
+		if len(rows) < INGESTION_PAGE_SIZE:
+			break
+
+
+def acquire_parquet_lock(table_name: str) -> bool:
+	key = frappe.cache.make_key(f"{PARQUET_LOCK_KEY}:{table_name}")
+	return bool(frappe.cache.set(key, 1, nx=True, ex=PARQUET_LOCK_TTL))
+
+
+def release_parquet_lock(table_name: str):
+	frappe.cache.delete_value(f"{PARQUET_LOCK_KEY}:{table_name}")
+
+
+def ingest_new_rows_to_parquet(doctype: str, table_name: str, fields: list[str]):
+	"""Append new `doctype` rows to the Parquet files of `table_name`, unless another job is at it."""
+	if not acquire_parquet_lock(table_name):
+		return
+	try:
+		ingest_to_parquet(doctype, table_name, fields)
+	finally:
+		release_parquet_lock(table_name)
+
+
+def rebuild_parquet_table(doctype: str, table_name: str, fields: list[str]):
+	"""Re-ingest every `doctype` row into new Parquet files and swap them in for those of `table_name`.
+
+	The table's directory is a symlink to its current version. The new files are
+	written to a new version and the symlink is replaced in one rename, so readers
+	see either the old files or the new ones. The previous version is kept until
+	the next rebuild, for readers that listed its files just before the swap."""
+	if not acquire_parquet_lock(table_name):
+		return
+	try:
+		rebuild_name = f"{table_name}{PARQUET_REBUILD_SUFFIX}"
+		table_dir, rebuild_dir = get_parquet_dir(table_name), get_parquet_dir(rebuild_name)
+		# left over from a rebuild that failed halfway
+		shutil.rmtree(rebuild_dir, ignore_errors=True)
+
+		ingest_to_parquet(doctype, rebuild_name, fields)
+		os.makedirs(rebuild_dir, exist_ok=True)
+		version_dir = f"{table_dir}{PARQUET_VERSION_SEPARATOR}{frappe.generate_hash(length=10)}"
+		os.rename(rebuild_dir, version_dir)
+
+		previous_dir = os.path.realpath(table_dir) if os.path.islink(table_dir) else None
+		if os.path.isdir(table_dir) and not previous_dir:
+			# written before tables were versioned: readers miss it between these two renames, once
+			previous_dir = f"{table_dir}{PARQUET_VERSION_SEPARATOR}{frappe.generate_hash(length=10)}"
+			os.rename(table_dir, previous_dir)
+		temp_link = f"{table_dir}.link-{frappe.generate_hash(length=8)}"
+		os.symlink(os.path.basename(version_dir), temp_link)
+		os.replace(temp_link, table_dir)
+
+		for stale_dir in glob.glob(f"{glob.escape(table_dir)}{PARQUET_VERSION_SEPARATOR}*"):
+			if stale_dir not in (version_dir, previous_dir):
+				shutil.rmtree(stale_dir, ignore_errors=True)
+	finally:
+		release_parquet_lock(table_name)
+
+
+def compact_parquet_table(table_name: str, retention_days: int | None = None):
+	"""Merge the files of each past day into one, and drop the days older than `retention_days`."""
+	if not acquire_parquet_lock(table_name):
+		return
+	try:
+		compact_parquet_partitions(table_name, retention_days)
+	finally:
+		release_parquet_lock(table_name)
+
+
+def compact_parquet_partitions(table_name: str, retention_days: int | None = None):
+	table_dir = get_parquet_dir(table_name)
+	# files of a page past the watermark may still be replaced by a retry, they are left alone
+	pending_page_key = get_parquet_page_key(*get_parquet_watermark(table_name))
+	today = frappe.utils.getdate()
+	expire_before = str(frappe.utils.add_days(today, -retention_days)) if retention_days else None
+
+	# today's partition is still being written to
+	for day in get_parquet_partitions(table_dir, to_day=str(frappe.utils.add_days(today, -1))):
+		partition_dir = os.path.join(table_dir, f"day={day}")
+		if expire_before and day < expire_before:
+			shutil.rmtree(partition_dir, ignore_errors=True)
+			continue
+
+		files = [
+			file
+			for file in get_parquet_files(table_dir, day)
+			if not os.path.basename(file).startswith(pending_page_key)
+		]
+		if len(files) < 2:
+			continue
+		staging_file = os.path.join(table_dir, PARQUET_STAGING_DIR, f"{frappe.generate_hash()}.parquet")
+		os.makedirs(os.path.dirname(staging_file), exist_ok=True)
+		with duckdb.connect() as db:
+			db.execute(
+				f"""
+				COPY (SELECT * FROM read_parquet([{", ".join(to_sql_string(file) for file in files)}]) ORDER BY creation)
+				TO {to_sql_string(staging_file)} (FORMAT parquet)
+				"""
+			)
+		# the old files go only once the compacted one is in place, a failure never loses rows
+		os.rename(staging_file, os.path.join(partition_dir, f"part_{frappe.generate_hash()}.parquet"))
+		for file in files:
+			os.remove(file)
+
+
+def compact_analytics_storage():
+	"""Daily: compact (and expire) the Parquet partitions of the analytics tables."""
+	if not use_parquet_storage():
+		return
+	retention_days = frappe.utils.cint(frappe.conf.get("builder_analytics_retention_days")) or None
+	for table_name in (DUCKDB_TABLE, CLICKS_TABLE):
+		try:
+			compact_parquet_table(table_name, retention_days)
+		except Exception:
+			frappe.log_error(title=f"Failed to compact analytics table {table_name}")
+
+
+INGESTION_WATERMARKS_TABLE = "ingestion_watermarks"
+INGESTION_PAGE_SIZE = 20000
 
 
 def setup_table(table_name: str, doctype: str, fields: list[str]):
 	"""(Re)build a DuckDB table as a full snapshot of `doctype`."""
+	if use_parquet_storage():
+		rebuild_parquet_table(doctype, table_name, fields)
+		return
+
 	with DuckDBConnection() as db:
-		df = pd.read_sql(f"SELECT {', '.join(fields)} FROM `tab{doctype}`", frappe.db.get_connection())  # type: ignore
-		db.register("df", df)
-		select_cols = ", ".join(duckdb_column_cast(f) for f in fields)
-		db.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT {select_cols} FROM df")
-		frappe.logger().info(f"Ingested {len(df)} {doctype} records into DuckDB ({table_name})")
+		create_watermarks_table(db)
+		db.begin()
+		columns = ", ".join(f"{field} {get_duckdb_type(field)}" for field in fields)
+		db.execute(f"CREATE OR REPLACE TABLE {table_name} ({columns})")
+		if doctype in ROLLUP_DIMENSIONS:
+			create_rollup_tables(db, table_name, doctype)
+		set_watermark(db, table_name, None, None, 0)
+		db.commit()
+
+		ingest_pages(db, table_name, doctype, fields)
 
 
 def ingest_to_duckdb(doctype: str, table_name: str, fields: list[str]):
 	"""Incrementally append new `doctype` rows into its DuckDB table, recreating it if missing or stale."""
+	if use_parquet_storage():
+		ingest_new_rows_to_parquet(doctype, table_name, fields)
+		return
+
 	with DuckDBConnection() as db:
-		table_exists = db.execute(
-			f"SELECT COUNT(*) FROM information_schema.tables WHERE table_name = '{table_name}'"
-		).fetchone()
-		if table_exists and table_exists[0] == 0:
+		if not table_exists(db, table_name):
 			setup_table(table_name, doctype, fields)
 			return
 
@@ -148,34 +677,121 @@ def ingest_to_duckdb(doctype: str, table_name: str, fields: list[str]):
 			setup_table(table_name, doctype, fields)
 			return
 
-		columns = ", ".join(fields)
-		placeholders = ", ".join(duckdb_insert_placeholder(f) for f in fields)
-		page_size = 20000
+		create_watermarks_table(db)
 		db.begin()
+		rollup_tables = [get_rollup_table(table_name, granularity) for granularity in ROLLUP_GRANULARITIES]
+		if doctype in ROLLUP_DIMENSIONS and not all(table_exists(db, table) for table in rollup_tables):
+			setup_rollups(db, table_name, doctype)
+		if not get_watermark(db, table_name):
+			# ingested before watermarks were kept: every row up to the latest creation is in
+			last_creation, count = db.execute(f"SELECT MAX(creation), COUNT(*) FROM {table_name}").fetchone()
+			set_watermark(db, table_name, last_creation, None, count)
+		db.commit()
 
-		while True:
-			result = db.execute(f"SELECT MAX(creation) FROM {table_name}").fetchone()
-			last_record = result[0] if result and result[0] else None
-
-			filters = {"creation": [">", last_record]} if last_record else {}
-			records = frappe.get_all(
-				doctype,
-				filters=filters,
-				fields=fields,
-				as_list=True,
-				limit=page_size,
-				order_by="creation asc",
-			)
+		ingest_pages(db, table_name, doctype, fields)
+
+
+def create_watermarks_table(db):
+	db.execute(
+		f"""
+		CREATE TABLE IF NOT EXISTS {INGESTION_WATERMARKS_TABLE} (
+			table_name VARCHAR PRIMARY KEY,
+			last_creation TIMESTAMP,
+			last_name VARCHAR,
+			rows_ingested BIGINT NOT NULL
+		)
+		"""
+	)
+
+
+def get_watermark(db, table_name: str) -> tuple | None:
+	"""(creation, name, rows ingested) of the last row ingested into `table_name`."""
+	return db.execute(
+		f"SELECT last_creation, last_name, rows_ingested FROM {INGESTION_WATERMARKS_TABLE} WHERE table_name = ?",
+		[table_name],
+	).fetchone()
+
+
+def set_watermark(db, table_name: str, last_creation, last_name: str | None, rows_ingested: int):
+	db.execute(
+		f"INSERT OR REPLACE INTO {INGESTION_WATERMARKS_TABLE} VALUES (?, ?, ?, ?)",
+		[table_name, last_creation, last_name, rows_ingested],
+	)
 
-			if not records:
-				break
 
-			db.executemany(f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})", records)
+def ingest_pages(db, table_name: str, doctype: str, fields: list[str]):
+	"""Append the `doctype` rows after the table's watermark, a page at a time.
 
-			if len(records) < page_size:
-				break
+	Each page is appended, rolled up and the watermark moved past its last row in
+	one transaction, so every row is ingested exactly once, even if the job is
+	killed halfway through a large backlog (e.g. the first backfill)."""
+	last_creation, last_name, rows_ingested = get_watermark(db, table_name)
+	while True:
+		rows = get_ingestion_page(doctype, fields, last_creation, last_name)
+		if not rows:
+			break
 
+		last_name, last_creation = rows[-1][0], rows[-1][fields.index("creation") + 1]
+		rows_ingested += len(rows)
+		db.begin()
+		append_page(db, table_name, doctype, get_arrow_page(fields, rows))
+		set_watermark(db, table_name, last_creation, last_name, rows_ingested)
 		db.commit()
+		frappe.logger().info(f"Ingested {rows_ingested} {doctype} records into DuckDB ({table_name})")
+
+		if len(rows) < INGESTION_PAGE_SIZE:
+			break
+
+
+def get_ingestion_page(doctype: str, fields: list[str], last_creation=None, last_name: str | None = None):
+	"""The next page of `doctype` rows (name first, then `fields`) in (creation, name) order.
+
+	Keyed on the last row of the previous page rather than on creation alone, so
+	rows sharing a creation timestamp across a page boundary are neither skipped
+	nor read twice, and each page is an index range scan."""
+	condition, values = "", {}
+	if last_creation and last_name:
+		condition = "WHERE creation > %(creation)s OR (creation = %(creation)s AND name > %(name)s)"
+		values = {"creation": last_creation, "name": last_name}
+	elif last_creation:
+		condition = "WHERE creation > %(creation)s"
+		values = {"creation": last_creation}
+
+	select_columns = ", ".join(f"`{field}`" for field in ["name", *fields])
+	return frappe.db.sql(
+		f"""SELECT {select_columns} FROM `tab{doctype}` {condition}
+		ORDER BY creation, name LIMIT {INGESTION_PAGE_SIZE}""",
+		values,
+		as_list=True,
+	)
+
+
+def get_arrow_page(fields: list[str], rows: list) -> pa.Table:
+	"""Arrow table of a page of rows (name first, then `fields`), for DuckDB to append in bulk."""
+	columns = list(zip(*rows, strict=True)) if rows else [[] for _ in range(len(fields) + 1)]
+	arrays = {}
+	for index, field in enumerate(fields, start=1):
+		if field == "creation":
+			arrays[field] = pa.array(columns[index], type=pa.timestamp("us"))
+		else:
+			# source types vary (is_unique is a string on Web Page View), DuckDB casts them
+			values = [None if value is None else str(value) for value in columns[index]]
+			arrays[field] = pa.array(values, type=pa.string())
+	return pa.table(arrays)
+
+
+def append_page(db, table_name: str, doctype: str, page: pa.Table):
+	"""Append an Arrow page to a DuckDB table and add it to the table's rollups."""
+	select_cols = ", ".join(duckdb_column_cast(field) for field in page.column_names)
+	db.register("ingestion_page", page)
+	try:
+		db.execute(
+			f"INSERT INTO {table_name} ({', '.join(page.column_names)}) SELECT {select_cols} FROM ingestion_page"
+		)
+		if doctype in ROLLUP_DIMENSIONS:
+			update_rollups(db, table_name, doctype, source=f"(SELECT {select_cols} FROM ingestion_page)")
+	finally:
+		db.unregister("ingestion_page")
 
 
 def setup_duckdb_table(table_name=DUCKDB_TABLE):
@@ -209,46 +825,98 @@ def get_interval_formats(interval):
 	return display_formats[interval], sort_formats.get(interval, display_formats[interval])
 
 
-def get_aggregated_views_query(where_clause, table_name=DUCKDB_TABLE):
+def get_rollup_granularity(
+	interval: str | None = None, from_date: str | None = None, to_date: str | None = None
+) -> str | None:
+	"""The coarsest rollup that answers a query exactly, or None if it needs the raw rows."""
+	date_range = get_date_range(from_date, to_date)
+	if not date_range:
+		return "hourly" if interval == "hourly" else "daily"
+
+	start, end = (frappe.utils.get_datetime(value) for value in date_range)
+	# rollup buckets are whole hours (or days), sub-hour ranges only match raw rows
+	if (start.minute, start.second, start.microsecond) != (0, 0, 0) or (end.minute, end.second) != (59, 59):
+		return None
+	if interval != "hourly" and start.hour == 0 and end.hour == 23:
+		return "daily"
+	return "hourly"
+
+
+def get_query_source(
+	db,
+	table_name=DUCKDB_TABLE,
+	interval: str | None = None,
+	from_date: str | None = None,
+	to_date: str | None = None,
+) -> frappe._dict:
+	"""Table and column expressions to query `table_name` with, from its rollups where possible."""
+	if use_parquet_storage():
+		return frappe._dict(
+			table=get_parquet_relation(table_name, from_date, to_date),
+			time_column="creation",
+			count="COUNT(*)",
+			unique_count="SUM(is_unique)",
+			referrer_domain=REFERRER_DOMAIN_SQL,
+		)
+
+	granularity = get_rollup_granularity(interval, from_date, to_date)
+	if granularity and table_exists(db, get_rollup_table(table_name, granularity)):
+		return frappe._dict(
+			table=get_rollup_table(table_name, granularity),
+			time_column="bucket",
+			count="SUM(hits)",
+			unique_count="SUM(unique_hits)",
+			referrer_domain="referrer_domain",
+		)
+	return frappe._dict(
+		table=table_name,
+		time_column="creation",
+		count="COUNT(*)",
+		unique_count="SUM(is_unique)",
+		referrer_domain=REFERRER_DOMAIN_SQL,
+	)
+
+
+def get_source_where_clause(
+	source: frappe._dict,
+	route: str | None = None,
+	from_date: str | None = None,
+	to_date: str | None = None,
+	route_filter_type: str = "wildcard",
+) -> tuple[str, list]:
+	return build_where_clause(route, from_date, to_date, route_filter_type, time_column=source.time_column)
+
+
+def get_aggregated_views_query(where_clause, source):
 	"""Get query for total and unique view counts"""
-	return f"SELECT COUNT(*) as total_views, SUM(is_unique) as unique_views FROM {table_name} WHERE {where_clause}"
+	return f"SELECT {source.count} as total_views, {source.unique_count} as unique_views FROM {source.table} WHERE {where_clause}"
 
 
-def get_interval_views_query(where_clause, interval, table_name=DUCKDB_TABLE):
+def get_interval_views_query(where_clause, interval, source):
 	"""Get query for views grouped by time interval"""
 	display_fmt, sort_fmt = get_interval_formats(interval)
+	time_column = source.time_column
 	return f"""
 		SELECT
-			strftime('{display_fmt}', creation) as interval,
-			COUNT(*) as total_page_views,
-			SUM(is_unique) as unique_page_views
-		FROM {table_name}
-		WHERE ({where_clause}) AND creation IS NOT NULL
-		GROUP BY interval, strftime('{sort_fmt}', creation)
-		ORDER BY strftime('{sort_fmt}', creation)
+			strftime('{display_fmt}', {time_column}) as interval,
+			{source.count} as total_page_views,
+			{source.unique_count} as unique_page_views
+		FROM {source.table}
+		WHERE ({where_clause}) AND {time_column} IS NOT NULL
+		GROUP BY interval, strftime('{sort_fmt}', {time_column})
+		ORDER BY strftime('{sort_fmt}', {time_column})
 	"""
 
 
-def get_referrer_domain_query(where_clause, limit=10, table_name=DUCKDB_TABLE):
+def get_referrer_domain_query(where_clause, source, limit=10):
 	"""Get query for top referrer domains with counts"""
 	return f"""
-		WITH parsed_referrers AS (
-			SELECT
-				CASE
-					WHEN referrer IS NULL OR referrer = '' THEN 'direct'
-					WHEN REGEXP_MATCHES(referrer, '^https?://([^/]+)') THEN
-						REGEXP_REPLACE(REGEXP_EXTRACT(referrer, '^https?://([^/]+)', 1), '^www\\.', '')
-					ELSE 'direct'
-				END as domain,
-				is_unique
-			FROM {table_name}
-			WHERE {where_clause}
-		)
 		SELECT
-			domain,
-			COUNT(*) as total_count,
-			SUM(is_unique) as unique_count
-		FROM parsed_referrers
+			{source.referrer_domain} as domain,
+			{source.count} as total_count,
+			{source.unique_count} as unique_count
+		FROM {source.table}
+		WHERE {where_clause}
 		GROUP BY domain
 		ORDER BY total_count DESC
 		LIMIT {limit}
@@ -270,35 +938,62 @@ def get_page_analytics(
 		if not date_filter:
 			return get_empty_analytics()
 
-		where_clause, params = build_where_clause(route, from_date, to_date, route_filter_type)
-
 		# Use provided interval or default to daily
 		interval = interval or "daily"
 
 		with DuckDBConnection(read_only=True) as db:
-			# Get interval-based data
-			interval_query = get_interval_views_query(where_clause, interval, table_name)
-			rows = db.execute(interval_query, params).fetchall()
-
-			# Get total views
-			total_query = get_aggregated_views_query(where_clause, table_name)
-			total_views, total_unique_views = db.execute(total_query, params).fetchone() or (0, 0)
+			source = get_query_source(db, table_name, interval, from_date, to_date)
+			where_clause, params = get_source_where_clause(
+				source, route, from_date, to_date, route_filter_type
+			)
 
-			# Get top referrers for this specific page/route
-			referrer_query = get_referrer_domain_query(where_clause, 10, table_name)
-			referrer_rows = db.execute(referrer_query, params).fetchall()
+			# interval-based data, total views and top referrers for this specific page/route
+			rows, total_rows, referrer_rows = run_queries(
+				db,
+				[
+					(get_interval_views_query(where_clause, interval, source), params),
+					(get_aggregated_views_query(where_clause, source), params),
+					(get_referrer_domain_query(where_clause, source, 10), params),
+				],
+			)
 
-		return {
-			"total_unique_views": total_unique_views or 0,
-			"total_views": total_views or 0,
-			"data": [{"interval": r[0], "total_page_views": r[1], "unique_page_views": r[2]} for r in rows],
-			"top_referrers": [{"domain": r[0], "count": r[1]} for r in referrer_rows],
-		}
+		return format_page_analytics(rows, total_rows, referrer_rows)
 	except Exception as e:
 		frappe.log_error("DuckDB Analytics Error", str(e))
 		return get_empty_analytics()
 
 
+def format_page_analytics(rows: list[tuple], total_rows: list[tuple], referrer_rows: list[tuple]) -> dict:
+	total_views, total_unique_views = total_rows[0] if total_rows else (0, 0)
+	return {
+		"total_unique_views": total_unique_views or 0,
+		"total_views": total_views or 0,
+		"data": [{"interval": r[0], "total_page_views": r[1], "unique_page_views": r[2]} for r in rows],
+		"top_referrers": [{"domain": r[0], "count": r[1]} for r in referrer_rows],
+	}
+
+
+def get_top_pages_query(where_clause, source):
+	"""Get query for the most viewed pages"""
+	where_clause = "" if where_clause == "1=1" else f"WHERE {where_clause}"
+	return f"""
+		SELECT path as route, {source.count} as view_count, {source.unique_count} as unique_view_count
+		FROM {source.table}
+		{where_clause}
+		GROUP BY path
+		ORDER BY view_count DESC
+		LIMIT 20
+	"""
+
+
+def format_top_pages(rows: list[tuple]) -> list[dict]:
+	return [{"route": r[0], "view_count": r[1], "unique_view_count": r[2]} for r in rows]
+
+
+def format_top_referrers(rows: list[tuple]) -> list[dict]:
+	return [{"domain": r[0], "count": r[1], "unique_count": r[2]} for r in rows]
+
+
 def get_top_pages(
 	table_name=DUCKDB_TABLE,
 	route=None,
@@ -307,23 +1002,38 @@ def get_top_pages(
 	route_filter_type: str = "wildcard",
 ):
 	try:
-		inner_clause, params = build_where_clause(route, from_date, to_date, route_filter_type)
-		where_clause = "" if inner_clause == "1=1" else f"WHERE {inner_clause}"
+		with DuckDBConnection(read_only=True) as db:
+			source = get_query_source(db, table_name, from_date=from_date, to_date=to_date)
+			where_clause, params = get_source_where_clause(
+				source, route, from_date, to_date, route_filter_type
+			)
+			rows = db.execute(get_top_pages_query(where_clause, source), params).fetchall()
+			return format_top_pages(rows)
+	except Exception as e:
+		frappe.log_error("DuckDB Analytics Error in top pages", str(e))
+		return []
+
 
+def get_recent_views_by_path(days: int = 30, limit: int = 1000, table_name=DUCKDB_TABLE) -> dict[str, int]:
+	"""View counts of the most visited paths over the last `days` days."""
+	try:
+		since = frappe.utils.add_days(frappe.utils.now_datetime(), -days)
 		with DuckDBConnection(read_only=True) as db:
+			source = get_query_source(
+				db, table_name, from_date=str(since), to_date=str(frappe.utils.now_datetime())
+			)
 			q = f"""
-				SELECT path as route, COUNT(*) as view_count, SUM(is_unique) as unique_view_count
-				FROM {table_name}
-				{where_clause}
+				SELECT path, {source.count} as view_count
+				FROM {source.table}
+				WHERE {source.time_column} >= CAST(? AS TIMESTAMP)
 				GROUP BY path
 				ORDER BY view_count DESC
-				LIMIT 20
+				LIMIT ?
 			"""
-			rows = db.execute(q, params).fetchall()
-			return [{"route": r[0], "view_count": r[1], "unique_view_count": r[2]} for r in rows]
+			return dict(db.execute(q, [str(since), limit]).fetchall())
 	except Exception as e:
-		frappe.log_error("DuckDB Analytics Error in top pages", str(e))
-		return []
+		frappe.log_error("DuckDB Analytics Error in recent views", str(e))
+		return {}
 
 
 def get_top_referrers(
@@ -335,12 +1045,14 @@ def get_top_referrers(
 ):
 	"""Get top referrers from analytics data using SQL for domain extraction"""
 	try:
-		where_clause, params = build_where_clause(route, from_date, to_date, route_filter_type)
-
 		with DuckDBConnection(read_only=True) as db:
-			referrer_query = get_referrer_domain_query(where_clause, 20, table_name)
+			source = get_query_source(db, table_name, from_date=from_date, to_date=to_date)
+			where_clause, params = get_source_where_clause(
+				source, route, from_date, to_date, route_filter_type
+			)
+			referrer_query = get_referrer_domain_query(where_clause, source, 20)
 			rows = db.execute(referrer_query, params).fetchall()
-			return [{"domain": r[0], "count": r[1], "unique_count": r[2]} for r in rows]
+			return format_top_referrers(rows)
 	except Exception as e:
 		frappe.log_error("DuckDB Analytics Error in top referrers", str(e))
 		return []
@@ -355,29 +1067,39 @@ def get_overall_analytics(
 	route_filter_type: str = "wildcard",
 ):
 	"""Get overall site analytics with top pages and referrers"""
-	analytics = get_page_analytics(
-		route=route,
-		interval=interval,
-		table_name=table_name,
-		from_date=from_date,
-		to_date=to_date,
-		route_filter_type=route_filter_type,
-	)
-	analytics["top_pages"] = get_top_pages(
-		table_name=table_name,
-		route=route,
-		from_date=from_date,
-		to_date=to_date,
-		route_filter_type=route_filter_type,
-	)
-	analytics["top_referrers"] = get_top_referrers(
-		table_name=table_name,
-		route=route,
-		from_date=from_date,
-		to_date=to_date,
-		route_filter_type=route_filter_type,
-	)
-	return analytics
+	try:
+		interval = interval or "daily"
+		with DuckDBConnection(read_only=True) as db:
+			source = get_query_source(db, table_name, from_date=from_date, to_date=to_date)
+			where_clause, params = get_source_where_clause(
+				source, route, from_date, to_date, route_filter_type
+			)
+			queries = {
+				"top_pages": (get_top_pages_query(where_clause, source), params),
+				"top_referrers": (get_referrer_domain_query(where_clause, source, 20), params),
+			}
+			# A date range is required for page analytics
+			if get_date_range(from_date, to_date):
+				interval_source = get_query_source(db, table_name, interval, from_date, to_date)
+				interval_clause, interval_params = get_source_where_clause(
+					interval_source, route, from_date, to_date, route_filter_type
+				)
+				queries["data"] = (
+					get_interval_views_query(interval_clause, interval, interval_source),
+					interval_params,
+				)
+				queries["totals"] = (get_aggregated_views_query(where_clause, source), params)
+
+			# all on one connection, concurrently
+			results = dict(zip(queries, run_queries(db, list(queries.values())), strict=True))
+
+		analytics = format_page_analytics(results.get("data", []), results.get("totals", []), [])
+		analytics["top_pages"] = format_top_pages(results["top_pages"])
+		analytics["top_referrers"] = format_top_referrers(results["top_referrers"])
+		return analytics
+	except Exception as e:
+		frappe.log_error("DuckDB Analytics Error", str(e))
+		return {**get_empty_analytics(), "top_pages": []}
 
 
 def enqueue_web_page_view_ingesion():
@@ -404,39 +1126,35 @@ def get_page_ctr(
 	"""Click-through rate per page/element: clicks (from web_page_clicks) over page views
 	(from web_page_views), joined on the shared `path`."""
 	try:
-		date_filter, _ = get_date_filter(from_date, to_date)
-		if not date_filter:
+		if not get_date_range(from_date, to_date):
 			return get_empty_ctr()
 
-		where_clause, params = build_where_clause(route, from_date, to_date, route_filter_type)
-
 		# read-only so this SELECT-only query doesn't take the exclusive write lock and
 		# starve the concurrent get_page_analytics read on the same dashboard load
 		with DuckDBConnection(read_only=True) as db:
-			total_views = (
-				db.execute(f"SELECT COUNT(*) FROM {DUCKDB_TABLE} WHERE {where_clause}", params).fetchone()[0]
-				or 0
+			views = get_query_source(db, DUCKDB_TABLE, from_date=from_date, to_date=to_date)
+			clicks = get_query_source(db, CLICKS_TABLE, from_date=from_date, to_date=to_date)
+			views_clause, views_params = get_source_where_clause(
+				views, route, from_date, to_date, route_filter_type
 			)
-			total_clicks = (
-				db.execute(f"SELECT COUNT(*) FROM {CLICKS_TABLE} WHERE {where_clause}", params).fetchone()[0]
-				or 0
+			clicks_clause, clicks_params = get_source_where_clause(
+				clicks, route, from_date, to_date, route_filter_type
 			)
 
-			element_rows = db.execute(
-				f"""
+			element_query = f"""
 				WITH clicks AS (
 					SELECT
 						path,
 						element,
 						COALESCE(NULLIF(ANY_VALUE(text), ''), element) AS label,
-						COUNT(*) AS clicks,
-						SUM(is_unique) AS unique_clicks
-					FROM {CLICKS_TABLE}
-					WHERE {where_clause}
+						{clicks.count} AS clicks,
+						{clicks.unique_count} AS unique_clicks
+					FROM {clicks.table}
+					WHERE {clicks_clause}
 					GROUP BY path, element
 				),
 				views AS (
-					SELECT path, COUNT(*) AS views FROM {DUCKDB_TABLE} WHERE {where_clause} GROUP BY path
+					SELECT path, {views.count} AS views FROM {views.table} WHERE {views_clause} GROUP BY path
 				)
 				SELECT clicks.label, clicks.element, clicks.path,
 					clicks.clicks, clicks.unique_clicks, COALESCE(views.views, 0) AS views
@@ -444,9 +1162,17 @@ def get_page_ctr(
 				LEFT JOIN views ON clicks.path = views.path
 				ORDER BY clicks.clicks DESC
 				LIMIT 50
-				""",
-				params + params,
-			).fetchall()
+			"""
+			views_rows, clicks_rows, element_rows = run_queries(
+				db,
+				[
+					(f"SELECT {views.count} FROM {views.table} WHERE {views_clause}", views_params),
+					(f"SELECT {clicks.count} FROM {clicks.table} WHERE {clicks_clause}", clicks_params),
+					(element_query, clicks_params + views_params),
+				],
+			)
+			total_views = views_rows[0][0] or 0
+			total_clicks = clicks_rows[0][0] or 0
 
 		return {
 			"total_views": total_views,
@@ -0,0 +1,44 @@
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("warm-builder-cache")
+@click.option("--page", "pages", multiple=True, help="Only warm this Builder Page (can be repeated)")
+@click.option("--enqueue", is_flag=True, default=False, help="Warm in background jobs instead")
+@pass_context
+def warm_builder_cache(context, pages=None, enqueue=False):
+	"Compile and render published Builder Pages ahead of their visitors, most visited first"
+	import frappe
+
+	from builder.builder.cache_warming import (
+		enqueue_cache_warming,
+		get_warming_targets,
+		start_progress,
+		warm_pages,
+	)
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		if enqueue:
+			enqueue_cache_warming(list(pages) or None)
+			frappe.db.commit()
+			click.echo("Queued cache warming")
+			return
+
+		targets = get_warming_targets(list(pages) or None)
+		run_id = start_progress(len(targets), full=not pages)
+
+		def report(progress):
+			click.echo(
+				f"Warmed {progress['done']}/{progress['total']} pages"
+				+ (f" ({progress['failed']} failed)" if progress["failed"] else "")
+			)
+
+		warm_pages(targets, run_id, on_progress=report)
+	finally:
+		frappe.destroy()
+
+
+commands = [warm_builder_cache]
@@ -57,6 +57,7 @@ website_generators = ["Builder Page"]
 jinja = {
 	"methods": [
 		"builder.builder.doctype.builder_component.builder_component.get_component_data",
+		"builder.builder.deferred_components.get_deferred_component_token",
 	],
 	"filters": [
 		"builder.utils.combine",
@@ -118,21 +119,35 @@ user_invitation = {
 # Hook on document methods and events
 
 doc_events = {
+	"*": {
+		"on_update": "builder.builder.render_cache.clear_page_output_cache_for_doc",
+		"on_submit": "builder.builder.render_cache.clear_page_output_cache_for_doc",
+		"on_cancel": "builder.builder.render_cache.clear_page_output_cache_for_doc",
+		"on_update_after_submit": "builder.builder.render_cache.clear_page_output_cache_for_doc",
+		"on_trash": "builder.builder.render_cache.clear_page_output_cache_for_doc",
+	},
 	"User Invitation": {
 		"after_insert": "builder.user_invitation.capture_user_invited",
-	}
+	},
 }
 
 # Scheduled Tasks
 # ---------------
 
 scheduler_events = {
+	"all": [
+		"builder.builder.cache_warming.enqueue_pending_cache_warming",
+	],
+	"daily": [
+		"builder.builder_analytics.compact_analytics_storage",
+		"builder.builder.component_stylesheet.prune_component_stylesheets",
+	],
 	"cron": {
 		"*/10 * * * *": [
 			"builder.builder_analytics.ingest_web_page_views_to_duckdb",
 			"builder.builder_analytics.ingest_clicks_to_duckdb",
 		],
-	}
+	},
 }
 
 # Testing
@@ -201,6 +216,8 @@ website_route_rules = [
 	{"from_route": f"/{builder_path}", "to_route": "_builder"},
 ]
 
+website_clear_cache = "builder.builder.render_cache.clear_render_cache"
+
 website_path_resolver = "builder.builder.doctype.builder_page.builder_page.resolve_path"
 page_renderer = "builder.builder.doctype.builder_page.builder_page.BuilderPageRenderer"
 
@@ -1,5 +1,6 @@
 from frappe.core.api.file import create_new_folder
 
+from builder.builder.cache_warming import enqueue_cache_warming
 from builder.export_import_standard_page import sync_standard_builder_pages
 from builder.utils import (
 	add_composite_index_to_web_page_view,
@@ -24,6 +25,7 @@ def after_migrate():
 	sync_block_templates()
 	sync_builder_tokens()
 	sync_standard_builder_pages()
+	enqueue_cache_warming()
 
 
 def after_app_install(app_name=None):
@@ -37,6 +37,7 @@ from frappe.modules.export_file import strip_default_fields
 from frappe.modules.import_file import import_file_by_path
 from frappe.utils import get_url, now
 
+from builder.builder.cache_warming import enqueue_cache_warming
 from builder.export_import_standard_page import extract_fonts_from_blocks, import_fonts
 from builder.utils import (
 	export_client_scripts,
@@ -98,6 +99,8 @@ def sync_builder_templates(app="builder", publish=False):
 			print(f"  ! skipped template group {group} (see error log)")
 
 	reconcile_deleted_templates(groups_pages)
+	if publish:
+		enqueue_cache_warming([name for page_names in groups_pages.values() for name in page_names])
 
 
 def import_template_pages(pages_path, group, publish=False):
@@ -129,6 +132,11 @@ def import_template_pages(pages_path, group, publish=False):
 				values["preview"] = fixture["preview"]
 			frappe.db.set_value("Builder Page", page_name, values, update_modified=False)
 			page_names.append(page_name)
+	if page_names:
+		from builder.builder.doctype.builder_page.builder_page import clear_route_table_cache
+
+		# set_value skips the page's route cache clearing, paths that 404'd before may resolve now
+		clear_route_table_cache()
 	return page_names
 
 
@@ -4,7 +4,7 @@ import re
 import shutil
 import socket
 from dataclasses import dataclass
-from functools import wraps
+from functools import lru_cache, wraps
 from os.path import join
 from urllib.parse import unquote, urlparse
 
@@ -234,37 +234,90 @@ def safe_get_all(*args, **kwargs):
 	return safe_get_list(*args, **kwargs)
 
 
+def safe_get_all_many(queries: dict | list) -> dict | list:
+	"""Run several `get_all` queries in one call, e.g.
+	`frappe.db.get_all_many({"posts": {"doctype": "Blog Post", "limit": 5}, "tags": {"doctype": "Blog Category"}})`.
+
+	Returns the results in the same shape (dict or list). Identical queries run
+	once per page render, even across component instances."""
+	memo = get_render_memo("queries")
+	if memo is None:
+		memo = {}
+
+	keys = queries.keys() if isinstance(queries, dict) else range(len(queries))
+	results = {}
+	for key in keys:
+		spec = dict(queries[key])
+		doctype = spec.pop("doctype", None)
+		if not isinstance(doctype, str):
+			frappe.throw(frappe._("Each query needs a doctype"))
+		spec_key = compact_json([doctype, spec])
+		if spec_key not in memo:
+			memo[spec_key] = safe_get_all(doctype, **spec)
+		# rows are shared between callers, hand out copies
+		results[key] = [row.copy() if isinstance(row, dict) else row for row in memo[spec_key]]
+
+	return results if isinstance(queries, dict) else [results[i] for i in keys]
+
+
+def get_render_memo(name: str) -> dict | None:
+	"""A dict shared by everything evaluated while rendering the current page
+	(see `BuilderPage.get_context`), or None outside of a render."""
+	memo = getattr(frappe.local, "builder_render_memo", None)
+	if memo is None:
+		return None
+	return memo.setdefault(name, {})
+
+
 def remove_unsafe_fields(fields):
 	return [f for f in fields if "(" not in f]
 
 
 def get_safer_globals():
-	safe_globals = get_safe_globals()
-
+	"""Globals for a data script: the prebuilt base with the request's `form_dict` and
+	`session` layered on. Every namespace a script can write to is a fresh copy, so
+	one script can't leak into another through the shared base."""
 	form_dict = getattr(frappe.local, "form_dict", frappe._dict())
 
 	if "_" in form_dict:
 		del frappe.local.form_dict["_"]
 
+	base = get_safer_globals_base()
+	out = NamespaceDict(base)
+	out.json = NamespaceDict(base.json)
+	out.args = form_dict
+	out.frappe = NamespaceDict(
+		base.frappe,
+		db=NamespaceDict(base.frappe.db),
+		form_dict=form_dict,
+		session=get_session_globals(),
+	)
+	return out
+
+
+@lru_cache(maxsize=1)
+def get_safer_globals_base() -> NamespaceDict:
+	"""The request independent part of the script globals, built once per worker."""
+	safe_globals = get_safe_globals()
+
 	out = NamespaceDict(
 		json=safe_globals["json"],
 		as_json=frappe.as_json,
 		dict=safe_globals["dict"],
-		args=form_dict,
 		frappe=NamespaceDict(
+			# frappe.db is per request (and site), resolve it on call
 			db=NamespaceDict(
-				count=frappe.db.count,
-				exists=frappe.db.exists,
+				count=late_bound_db_method("count"),
+				exists=late_bound_db_method("exists"),
 				get_all=safe_get_all,
+				get_all_many=safe_get_all_many,
 				get_list=safe_get_list,
-				get_single_value=frappe.db.get_single_value,
+				get_single_value=late_bound_db_method("get_single_value"),
 			),
-			form_dict=form_dict,
 			make_get_request=make_safe_get_request,
 			get_doc=get_doc_as_dict,
 			get_cached_doc=get_cached_doc_as_dict,
 			_=frappe._,
-			session=safe_globals["frappe"]["session"],
 		),
 	)
 
@@ -281,6 +334,23 @@ def get_safer_globals():
 	return out
 
 
+def late_bound_db_method(name: str):
+	def method(*args, **kwargs):
+		return getattr(frappe.db, name)(*args, **kwargs)
+
+	method.__name__ = name
+	return method
+
+
+def get_session_globals() -> frappe._dict:
+	# same as `frappe.session` in `get_safe_globals`
+	session = getattr(frappe.local, "session", None)
+	return frappe._dict(
+		user=(session and session.user) or "Guest",
+		csrf_token=session.data.csrf_token if session else "",
+	)
+
+
 def safer_exec(
 	script: str,
 	_globals: dict | None = None,
@@ -298,15 +368,20 @@ def safer_exec(
 
 	with safe_exec_flags():
 		# execute script compiled by RestrictedPython
-		exec(
-			compile_restricted(script, filename=filename, policy=FrappeTransformer),
-			exec_globals,
-			_locals,
-		)
+		exec(compile_restricted_script(script, filename), exec_globals, _locals)
 
 	return exec_globals, _locals
 
 
+@lru_cache(maxsize=256)
+def compile_restricted_script(script: str, filename: str, policy=FrappeTransformer):
+	"""Code object for a page/component/block data script, cached per worker.
+
+	RestrictedPython compilation (AST transform + compile) costs far more than
+	running a typical data script. Hits and misses: `compile_restricted_script.cache_info()`."""
+	return compile_restricted(script, filename=filename, policy=policy)
+
+
 def sync_page_templates():
 	print("Syncing Builder Components")
 	builder_component_path = frappe.get_module_path("builder", "builder_component")